@@ -2,6 +2,11 @@ from passlib.hash import argon2
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from typing import Optional
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+import metrics
 
 # JWT Config
 SECRET_KEY = "YOUR_SECRET_KEY_HERE"  # Change to a strong secret in production
@@ -25,8 +30,66 @@ def create_access_token(username: str, email: str, expires_delta: Optional[timed
 
 def decode_access_token(token: str):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        with metrics.token_verify.time():
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         # payload will have 'sub', 'email', 'exp'
         return payload
     except JWTError:
         return None
+
+# --- VERIFIED TOKEN CACHE ---
+class VerifiedTokenCache:
+    """Bounded LRU of verified JWT payloads keyed by the token's SHA-256 digest.
+
+    Entries are dropped at the token's `exp`, so a cached payload is never
+    served for a token that `decode` would now reject as expired.
+    """
+
+    def __init__(self, decode, maxsize=10000):
+        self.decode = decode
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # digest -> (payload, exp)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str):
+        digest = hashlib.sha256(token.encode()).digest()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(digest)
+                    self.hits += 1
+                    return entry[0]
+                del self._entries[digest]
+            self.misses += 1
+
+        payload = self.decode(token)
+        if payload is None or "exp" not in payload:
+            return payload
+        with self._lock:
+            self._entries[digest] = (payload, payload["exp"])
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return payload
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+token_cache = VerifiedTokenCache(decode_access_token)
+metrics.register_stats("token_cache", "Verified token cache", token_cache.stats)
+
+def decode_access_token_cached(token: str):
+    return token_cache.get(token)
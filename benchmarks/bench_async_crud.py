@@ -0,0 +1,87 @@
+# Compare requests/sec of the sync MongoCRUD path against AsyncMongoCRUD.
+#
+# Needs a local mongod on mongodb://localhost:27017/ and `pip install httpx`.
+# Run from the repo root:
+#   python benchmarks/bench_async_crud.py --requests 5000 --concurrency 200
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+
+from main import MongoCRUD, AsyncMongoCRUD
+
+DB_NAME = "benchDB"
+COLLECTION = "students"
+
+
+def build_sync_app():
+    db = MongoCRUD(db_name=DB_NAME, collection_name=COLLECTION)
+    app = FastAPI()
+
+    @app.get("/students/name/{name}")
+    def get_student_by_name(name: str):
+        student = db.read_one({"name": name})
+        return {"id": str(student["_id"]), "name": student["name"]}
+
+    return app
+
+
+def build_async_app():
+    db = AsyncMongoCRUD(db_name=DB_NAME, collection_name=COLLECTION)
+    app = FastAPI()
+
+    @app.get("/students/name/{name}")
+    async def get_student_by_name(name: str):
+        student = await db.read_one({"name": name})
+        return {"id": str(student["_id"]), "name": student["name"]}
+
+    return app
+
+
+def seed(n):
+    db = MongoCRUD(db_name=DB_NAME, collection_name=COLLECTION)
+    db.delete_all()
+    db.create_many([
+        {"name": f"student{i}", "age": 10 + i % 10, "city": "Lahore", "email": f"s{i}@example.com"}
+        for i in range(n)
+    ])
+    db.close_connection()
+
+
+async def run(app, total, concurrency, students):
+    transport = httpx.ASGITransport(app=app)
+    sem = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(i):
+            async with sem:
+                r = await client.get(f"/students/name/student{i % students}")
+                r.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--students", type=int, default=1000)
+    args = parser.parse_args()
+
+    seed(args.students)
+    for label, build in (("sync  MongoCRUD", build_sync_app), ("async AsyncMongoCRUD", build_async_app)):
+        rps = asyncio.run(run(build(), args.requests, args.concurrency, args.students))
+        print(f"{label:<22} {rps:10.1f} req/s  (concurrency={args.concurrency})")
+
+
+if __name__ == "__main__":
+    main()
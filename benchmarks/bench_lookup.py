@@ -0,0 +1,70 @@
+# Compare fetching a roster with N sequential GET /students/id/{id} calls
+# against a single POST /students/lookup, through the mongo_api.py app.
+#
+# Needs a local mongod on mongodb://localhost:27017/ and `pip install httpx`.
+# The routes are pointed at benchDB.students, which is emptied and reseeded;
+# the app's own testDB is never touched.
+# Run from the repo root:
+#   python benchmarks/bench_lookup.py --roster 30 --rounds 50
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import mongo_api
+from auth_utils import create_access_token
+from main import AsyncMongoCRUD
+from mongo_api import app
+
+DB_NAME = "benchDB"
+COLLECTION = "students"
+db = mongo_api.db = AsyncMongoCRUD(db_name=DB_NAME, collection_name=COLLECTION, versioned=True)
+
+
+async def seed(n):
+    await db.ensure_indexes()
+    await db.delete_all()
+    ids = await db.create_many([
+        {"name": f"student{i}", "age": 10 + i % 10, "city": "Lahore", "email": f"s{i}@example.com"}
+        for i in range(n)
+    ])
+    return [str(i) for i in ids]
+
+
+async def bench(roster, rounds):
+    ids = await seed(roster)
+    headers = {"Authorization": f"Bearer {create_access_token('bench', 'bench@example.com')}"}
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for i in ids:
+                (await client.get(f"/students/id/{i}")).raise_for_status()
+        per_id = (time.perf_counter() - start) / rounds
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            (await client.post("/students/lookup", json={"ids": ids})).raise_for_status()
+        lookup = (time.perf_counter() - start) / rounds
+
+    print(f"roster of {roster}: per-id {per_id * 1000:8.2f} ms  lookup {lookup * 1000:8.2f} ms  "
+          f"({per_id / lookup:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--roster", type=int, default=30)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(bench(args.roster, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# Compare the BaseHTTPMiddleware-based jwt_middleware against the pure ASGI
+# JWTAuthMiddleware for a small JSON response and a streamed response.
+#
+# No mongod needed. Needs `pip install httpx`.
+# Run from the repo root:
+#   python benchmarks/bench_middleware.py --requests 5000
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from auth_utils import create_access_token
+from jwt_middleware import jwt_middleware, JWTAuthMiddleware
+
+
+def build_app(asgi):
+    app = FastAPI()
+    if asgi:
+        app.add_middleware(JWTAuthMiddleware)
+    else:
+        app.middleware("http")(jwt_middleware)
+
+    @app.get("/students/small")
+    async def small():
+        return {"name": "Alice", "age": 15, "city": "Lahore", "email": "alice@example.com"}
+
+    @app.get("/students/stream")
+    async def stream():
+        async def rows():
+            for i in range(200):
+                yield b'{"name":"student%d"}\n' % i
+        return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+    return app
+
+
+async def run(app, path, total, concurrency, headers):
+    transport = httpx.ASGITransport(app=app)
+    sem = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        async def one():
+            async with sem:
+                (await client.get(path)).raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {create_access_token('bench', 'bench@example.com')}"}
+    for path in ("/students/small", "/students/stream"):
+        for label, asgi in (("BaseHTTPMiddleware", False), ("pure ASGI", True)):
+            rps = asyncio.run(run(build_app(asgi), path, args.requests, args.concurrency, headers))
+            print(f"{path:<18} {label:<20} {rps:10.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
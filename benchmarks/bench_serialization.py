@@ -0,0 +1,78 @@
+# Per-row cost of returning student lists through FastAPI's response_model
+# validation + jsonable_encoder versus the FastJSONResponse path.
+#
+# No mongod needed: rows are synthetic BSON-shaped documents.
+# Needs `pip install httpx` (and orjson for the fast path's best case).
+# Run from the repo root:
+#   python benchmarks/bench_serialization.py --sizes 1000 10000 100000
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from bson import ObjectId
+from fastapi import FastAPI
+
+from fast_json import FastJSONResponse, project, orjson
+from mongo_api import Student, STUDENT_FIELDS, student_helper
+
+
+def make_docs(n):
+    now = datetime.now()
+    return [
+        {"_id": ObjectId(), "name": f"student{i}", "age": 10 + i % 10, "city": "Lahore",
+         "email": f"s{i}@example.com", "created_at": now, "created_by": "bench"}
+        for i in range(n)
+    ]
+
+
+def build_app(docs):
+    app = FastAPI()
+
+    @app.get("/validated", response_model=List[Student])
+    async def validated():
+        return [student_helper(d) for d in docs]
+
+    @app.get("/fast", response_model=List[Student])
+    async def fast():
+        return FastJSONResponse([project(d, STUDENT_FIELDS) for d in docs])
+
+    return app
+
+
+async def time_route(client, path, rounds):
+    (await client.get(path)).raise_for_status()  # warm up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        (await client.get(path)).raise_for_status()
+    return (time.perf_counter() - start) / rounds
+
+
+async def bench(sizes, rounds):
+    print(f"encoder: {'orjson' if orjson else 'stdlib json'}")
+    print(f"{'rows':>8} {'validated us/row':>17} {'fast us/row':>12} {'speedup':>8}")
+    for n in sizes:
+        transport = httpx.ASGITransport(app=build_app(make_docs(n)))
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            slow = await time_route(client, "/validated", rounds)
+            fast = await time_route(client, "/fast", rounds)
+        print(f"{n:>8} {slow / n * 1e6:>17.2f} {fast / n * 1e6:>12.2f} {slow / fast:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(bench(args.sizes, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
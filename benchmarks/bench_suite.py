@@ -0,0 +1,192 @@
+# Micro-benchmarks for the auth and CRUD hot paths.
+#
+# Runs mongo_api.py and jwt.py in-process against an in-memory Mongo
+# stand-in (mongomock-motor), so no mongod is needed. For every case it
+# reports p50/p99/mean latency and the average bytes allocated per call
+# (tracemalloc peak), and can save/compare baselines between branches.
+#
+#   pip install httpx mongomock-motor
+#   python benchmarks/bench_suite.py --save main          # on the base branch
+#   python benchmarks/bench_suite.py --compare main       # on your branch
+#   python benchmarks/bench_suite.py --only decode route  # substring filter
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+BASELINE_DIR = os.path.join(ROOT, "benchmarks", "baselines")
+
+import httpx
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+import auth_utils
+import mongo_api
+import jwt as jwt_app  # the repo's jwt.py app, not PyJWT
+
+
+# --- CASES ---
+def function_cases():
+    token = auth_utils.create_access_token("bench", "bench@example.com")
+    doc = {"_id": ObjectId(), "name": "Alice", "age": 15, "city": "Lahore", "email": "alice@example.com"}
+    return {
+        "create_access_token": lambda: auth_utils.create_access_token("bench", "bench@example.com"),
+        "decode_access_token": lambda: auth_utils.decode_access_token(token),
+        "decode_access_token_cached": lambda: auth_utils.decode_access_token_cached(token),
+        "student_helper": lambda: mongo_api.student_helper(doc),
+    }
+
+
+async def seed():
+    mongo_api.db._client = AsyncMongoMockClient()
+    jwt_app.db._client = AsyncMongoMockClient()
+
+    ids = await mongo_api.db.create_many([
+        {"name": f"student{i}", "age": 10 + i % 10, "city": "Lahore", "email": f"s{i}@example.com"}
+        for i in range(500)
+    ])
+    await jwt_app.db.create_many([
+        {"name": f"student{i}", "age": 10 + i % 10, "grade": "10th", "email": f"s{i}@example.com"}
+        for i in range(500)
+    ])
+    await jwt_app.db.create_user({
+        "username": "bench", "email": "bench@example.com", "hashed_password": "unused", "role": "admin",
+    })
+    return str(ids[0])
+
+
+def route_cases(student_id):
+    api_headers = {"Authorization": f"Bearer {auth_utils.create_access_token('bench', 'bench@example.com')}"}
+    jwt_token = jwt_app.create_access_token({"sub": "bench", "role": "admin", "email": "bench@example.com"})
+    jwt_headers = {"Authorization": f"Bearer {jwt_token}"}
+    new_student = {"name": "Bench", "age": 12, "city": "Lahore", "email": "bench@example.com"}
+    return {
+        "route mongo_api GET /students/": (mongo_api.app, "GET", "/students/?limit=100", api_headers, None),
+        "route mongo_api GET /students/id/{id}": (mongo_api.app, "GET", f"/students/id/{student_id}", api_headers, None),
+        "route mongo_api GET /students/name/{name}": (mongo_api.app, "GET", "/students/name/student7", api_headers, None),
+        "route mongo_api GET /students/filter/age": (mongo_api.app, "GET", "/students/filter/age?min_age=17", api_headers, None),
+        "route mongo_api POST /students/": (mongo_api.app, "POST", "/students/", api_headers, new_student),
+        "route mongo_api GET /decode-token (middleware)": (mongo_api.app, "GET", "/decode-token", api_headers, None),
+        "route mongo_api 401 (middleware reject)": (mongo_api.app, "GET", "/students/", {}, None),
+        "route jwt GET /users/me": (jwt_app.app, "GET", "/users/me", jwt_headers, None),
+        "route jwt GET /students": (jwt_app.app, "GET", "/students?limit=100", jwt_headers, None),
+    }
+
+
+# --- MEASUREMENT ---
+def summarize(samples_ns, alloc_bytes):
+    samples_ns.sort()
+    return {
+        "n": len(samples_ns),
+        "p50_us": samples_ns[len(samples_ns) // 2] / 1000,
+        "p99_us": samples_ns[min(len(samples_ns) - 1, int(len(samples_ns) * 0.99))] / 1000,
+        "mean_us": statistics.fmean(samples_ns) / 1000,
+        "alloc_bytes": alloc_bytes,
+    }
+
+
+def measure_alloc(call, n=20):
+    tracemalloc.start()
+    total = 0
+    for _ in range(n):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        call()
+        total += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return total // n
+
+
+def bench_function(call, iterations):
+    for _ in range(min(100, iterations)):
+        call()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter_ns()
+        call()
+        samples.append(time.perf_counter_ns() - start)
+    return summarize(samples, measure_alloc(call))
+
+
+async def bench_route(app, method, path, headers, body, iterations):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        async def call():
+            return await client.request(method, path, json=body)
+
+        for _ in range(min(20, iterations)):
+            await call()
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter_ns()
+            await call()
+            samples.append(time.perf_counter_ns() - start)
+
+        tracemalloc.start()
+        total = 0
+        for _ in range(10):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            await call()
+            total += tracemalloc.get_traced_memory()[1] - before
+        tracemalloc.stop()
+    return summarize(samples, total // 10)
+
+
+# --- REPORTING ---
+def report(results, baseline=None):
+    print(f"{'case':<48} {'p50 us':>10} {'p99 us':>10} {'alloc B':>10}" + ("   p50 vs base" if baseline else ""))
+    for name, r in results.items():
+        line = f"{name:<48} {r['p50_us']:>10.1f} {r['p99_us']:>10.1f} {r['alloc_bytes']:>10}"
+        if baseline and name in baseline:
+            change = (r["p50_us"] - baseline[name]["p50_us"]) / baseline[name]["p50_us"] * 100
+            line += f"   {change:+7.1f}%"
+        print(line)
+
+
+async def run(args):
+    selected = lambda name: not args.only or any(s in name for s in args.only)
+    results = {}
+    for name, call in function_cases().items():
+        if selected(name):
+            results[name] = bench_function(call, args.iterations * 10)
+
+    student_id = await seed()
+    for name, (app, method, path, headers, body) in route_cases(student_id).items():
+        if selected(name):
+            results[name] = await bench_route(app, method, path, headers, body, args.iterations)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--only", nargs="*", help="run cases whose name contains any of these")
+    parser.add_argument("--save", metavar="NAME", help="save results as benchmarks/baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="compare against a saved baseline")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    baseline = None
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json")) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(os.path.join(BASELINE_DIR, f"{args.save}.json"), "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"saved baseline '{args.save}'")
+
+
+if __name__ == "__main__":
+    main()
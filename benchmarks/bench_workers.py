@@ -0,0 +1,149 @@
+# Throughput of serve.py as the worker count grows.
+#
+# For each --workers value this starts `python serve.py <app> --workers N`,
+# drives it with --load-procs load-generator processes (each an asyncio
+# httpx client) for --duration seconds, and reports requests/sec with
+# p50/p99 latency. The server is stopped with SIGTERM between runs, which
+# also exercises the graceful drain.
+#
+# Needs a mongod at MONGO_URI (default mongodb://localhost:27017/) and
+# `pip install uvicorn httpx` (plus uvloop/httptools to measure those).
+# Run from the repo root:
+#   python benchmarks/bench_workers.py --workers 1 2 4 8
+#   python benchmarks/bench_workers.py --app jwt --workers 1 4
+#   python benchmarks/bench_workers.py --app jwt --path / --workers 1 4
+#
+# Reading the results: throughput should grow close to linearly until the
+# workers saturate the cores (keep load generators on the same box in mind,
+# or point --url at a remote host) or mongod becomes the bottleneck, at
+# which point adding workers only adds latency. Comparing p99 between
+# runs shows where that knee is on a given machine.
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+
+USER = {"username": "bench_workers", "email": "bench@example.com", "password": "bench-password"}
+PATHS = {"mongo_api": "/students/?limit=20", "jwt": "/students?limit=20"}
+SEED = 500
+
+
+def wait_ready(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/metrics", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not start")
+
+
+def auth_headers(url, app):
+    """Register the bench user, log in and seed students when there are none."""
+    httpx.post(f"{url}/register", json=USER)  # 400 when it already exists
+    if app == "mongo_api":
+        token = httpx.post(f"{url}/token", json=USER).json()["access_token"]
+    else:  # jwt.py logs in with an OAuth2 password form
+        form = {"username": USER["username"], "password": USER["password"]}
+        token = httpx.post(f"{url}/login", data=form).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    students = [{"name": f"student{i}", "age": 10 + i % 10, "email": f"s{i}@example.com"} for i in range(SEED)]
+    if app == "mongo_api":
+        response = httpx.get(f"{url}/students/?limit=1", headers=headers)
+        if response.status_code == 404 or response.json() == []:
+            batch = [{**s, "city": "Lahore"} for s in students]
+            httpx.post(f"{url}/students/batch", json=batch, headers=headers).raise_for_status()
+    elif not httpx.get(f"{url}/students?limit=1", headers=headers).json()["students"]:
+        with httpx.Client(headers=headers) as client:  # jwt.py has no batch route
+            for s in students:
+                client.post(f"{url}/students", json={**s, "grade": "A"}).raise_for_status()
+    return headers
+
+
+async def _load(url, headers, concurrency, duration):
+    latencies, errors = [], 0
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(headers=headers, limits=limits, timeout=10) as client:
+        async def user():
+            nonlocal errors
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(url)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+        await asyncio.gather(*[user() for _ in range(concurrency)])
+    return latencies, errors
+
+
+def load_process(args):
+    return asyncio.run(_load(*args))
+
+
+def run(app, workers, url, path, load_procs, concurrency, duration):
+    port = url.rsplit(":", 1)[-1]
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", app, "--workers", str(workers), "--port", port],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(url)
+        headers = auth_headers(url, app)
+        job = (url + path, headers, max(1, concurrency // load_procs), duration)
+        with multiprocessing.Pool(load_procs) as pool:
+            results = pool.map(load_process, [job] * load_procs)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+    latencies = sorted(l for lats, _ in results for l in lats)
+    errors = sum(e for _, e in results)
+    if not latencies:
+        raise RuntimeError("no requests completed")
+    return {
+        "workers": workers,
+        "rps": len(latencies) / duration,
+        "p50_ms": 1000 * statistics.median(latencies),
+        "p99_ms": 1000 * latencies[int(len(latencies) * 0.99) - 1],
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app", choices=["mongo_api", "jwt"], default="mongo_api")
+    parser.add_argument("--path", help="default: a 20-student page of the app's list route")
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--load-procs", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--concurrency", type=int, default=256, help="total in-flight requests")
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+    path = args.path or PATHS[args.app]
+
+    base = None
+    print(f"{'workers':>7} {'req/s':>10} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for workers in sorted(set(args.workers)):
+        r = run(args.app, workers, args.url, path, args.load_procs, args.concurrency, args.duration)
+        base = base or r["rps"]
+        print(f"{r['workers']:>7} {r['rps']:>10.0f} {r['rps'] / base:>7.2f}x "
+              f"{r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import os
+import threading
+from pymongo import MongoClient, monitoring
+from motor.motor_asyncio import AsyncIOMotorClient
+import metrics
+
+# Mongo Config (override with environment variables)
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+
+
+def pool_options():
+    options = {
+        "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+        "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+        "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "0")) or None,
+        "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "0")) or None,
+    }
+    compressors = os.getenv("MONGO_COMPRESSORS", "")  # e.g. "zstd,snappy,zlib"
+    if compressors:
+        options["compressors"] = compressors
+    return options
+
+
+# --- POOL METRICS ---
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Live connection pool counters fed by pymongo's pool events."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.check_out_failed = 0
+        self.pools_cleared = 0
+
+    def _add(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "created": self.created,
+                "open": self.created - self.closed,
+                "checked_out": self.checked_out,
+                "waiting": self.waiting,
+                "check_out_failed": self.check_out_failed,
+                "pools_cleared": self.pools_cleared,
+            }
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._add(pools_cleared=1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._add(created=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add(closed=1)
+
+    def connection_check_out_started(self, event):
+        self._add(waiting=1)
+
+    def connection_check_out_failed(self, event):
+        self._add(waiting=-1, check_out_failed=1)
+
+    def connection_checked_out(self, event):
+        self._add(waiting=-1, checked_out=1)
+
+    def connection_checked_in(self, event):
+        self._add(checked_out=-1)
+
+
+# --- CLIENT FACTORY ---
+# One client of each flavour per process. Clients are keyed by pid so a
+# worker forked after the parent touched Mongo builds its own pool instead
+# of reusing sockets inherited from the parent.
+_lock = threading.Lock()
+_clients = {}
+pool_stats = PoolStats()
+metrics.register_stats("mongo_pool", "Connection pool", pool_stats.snapshot)
+
+
+def _get(kind, factory):
+    key = (kind, os.getpid())
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = factory(MONGO_URI, event_listeners=[pool_stats, metrics.command_metrics], **pool_options())
+                _clients[key] = client
+    return client
+
+
+def get_client():
+    return _get("sync", MongoClient)
+
+
+def get_async_client():
+    return _get("async", AsyncIOMotorClient)
+
+
+def close_clients():
+    """Close every client created by this process (call on shutdown)."""
+    pid = os.getpid()
+    with _lock:
+        for key in [k for k in _clients if k[1] == pid]:
+            _clients.pop(key).close()
+        # Drop entries inherited from a parent process without touching their sockets
+        for key in [k for k in _clients if k[1] != pid]:
+            _clients.pop(key)
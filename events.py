@@ -0,0 +1,185 @@
+"""In-process pub/sub of student change events, served as Server-Sent Events.
+
+CRUD objects built with `events=bus` publish one compact event per write.
+Every subscriber has a bounded buffer. A subscriber that falls
+EVENTS_BUFFER events behind is dropped, and its stream ends with a
+`dropped` event. The client then reconnects with Last-Event-ID, and the
+missed events are replayed from the last EVENTS_HISTORY events.
+Event ids are `<boot>-<seq>`, where boot is random per process: an id from
+before a restart, from another worker or too old to replay gets a `reset`
+event instead, telling the client to refetch.
+
+Events are per process. With several workers, set EVENTS_SOURCE=changestream
+(needs a replica set or sharded cluster) so each worker is fed every write
+from a Mongo change stream instead of only its own.
+"""
+import asyncio
+import os
+import secrets
+import time
+from collections import deque
+from pymongo.errors import PyMongoError
+from fast_json import dumps
+import metrics
+
+# Events config (override with environment variables)
+EVENTS_SOURCE = os.getenv("EVENTS_SOURCE", "local")  # local or changestream
+EVENTS_BUFFER = int(os.getenv("EVENTS_BUFFER", "256"))
+EVENTS_HISTORY = int(os.getenv("EVENTS_HISTORY", "1000"))
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))
+EVENTS_MAX_IDS = int(os.getenv("EVENTS_MAX_IDS", "100"))  # larger writes carry only a count
+
+
+class Subscription:
+    def __init__(self, maxsize):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = False
+
+
+class EventBus:
+    """Fan-out to subscribers. Call publish/subscribe from the event loop thread."""
+
+    def __init__(self, buffer=EVENTS_BUFFER, history=EVENTS_HISTORY):
+        self.buffer = buffer
+        self.history = deque(maxlen=history)
+        self.subscribers = set()
+        self.boot = secrets.token_hex(4)
+        self.seq = 0
+        self.published = 0
+        self.dropped = 0
+
+    def publish(self, op, collection, ids=(), count=None, fields=None):
+        self.seq += 1
+        ids = [str(i) for i in ids]
+        event = {"id": self._id(), "seq": self.seq, "op": op, "collection": collection, "count": len(ids) if count is None else count}
+        if ids and len(ids) <= EVENTS_MAX_IDS:
+            event["ids"] = ids
+        if fields:
+            event["fields"] = sorted(fields)
+        event["ts"] = time.time()
+        self.history.append(event)
+        self.published += 1
+        for sub in list(self.subscribers):
+            try:
+                sub.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._drop(sub)
+
+    def _drop(self, sub):
+        # Free the buffer so the drop notice (None) is the next thing the consumer sees
+        self.subscribers.discard(sub)
+        self.dropped += 1
+        sub.dropped = True
+        while not sub.queue.empty():
+            sub.queue.get_nowait()
+        sub.queue.put_nowait(None)
+
+    def _id(self):
+        return f"{self.boot}-{self.seq}"
+
+    def _seq_of(self, event_id):
+        # Sequence number of an id issued by this process, else None
+        boot, _, seq = event_id.partition("-")
+        return int(seq) if boot == self.boot and seq.isdigit() else None
+
+    def subscribe(self, last_event_id=None):
+        sub = Subscription(self.buffer)
+        if last_event_id:
+            seq = self._seq_of(last_event_id)
+            missed = [e for e in self.history if seq is not None and e["seq"] > seq]
+            if seq is not None and seq <= self.seq and (
+                    not missed or (missed[0]["seq"] == seq + 1 and len(missed) < self.buffer)):
+                for event in missed:
+                    sub.queue.put_nowait(event)
+            else:
+                # Unknown id (another process or boot) or too far behind to replay: tell the client to refetch
+                sub.queue.put_nowait({"id": self._id(), "seq": self.seq, "op": "reset", "ts": time.time()})
+        self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        self.subscribers.discard(sub)
+
+    def stats(self):
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "dropped_subscribers": self.dropped,
+            "last_seq": self.seq,
+            "history": len(self.history),
+        }
+
+
+bus = EventBus()
+metrics.register_stats("events", "Student change events", bus.stats)
+
+
+# --- SSE ---
+def _sse(event):
+    return f"id: {event['id']}\nevent: {event['op']}\ndata: {dumps(event).decode()}\n\n"
+
+async def sse_stream(bus, last_event_id=None, heartbeat=EVENTS_HEARTBEAT):
+    """text/event-stream chunks for one client; ends when the client is dropped."""
+    sub = bus.subscribe(last_event_id)
+    getter = None
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            # Keep one pending get() across heartbeats so no event is lost to a timeout
+            if getter is None:
+                getter = asyncio.ensure_future(sub.queue.get())
+            done, _ = await asyncio.wait({getter}, timeout=heartbeat)
+            if not done:
+                yield ": keep-alive\n\n"
+                continue
+            event, getter = getter.result(), None
+            if event is None:
+                yield "event: dropped\ndata: {}\n\n"
+                return
+            yield _sse(event)
+    finally:
+        if getter is not None:
+            getter.cancel()
+        bus.unsubscribe(sub)
+
+
+# --- CHANGE STREAM FEED ---
+CHANGE_OPS = {"insert": "insert", "update": "update", "replace": "update", "delete": "delete"}
+
+async def follow_change_stream(collection, bus, name):
+    """Publish every change to `collection` until cancelled, resuming after errors."""
+    token, delay = None, 1
+    while True:
+        try:
+            async with collection.watch(resume_after=token) as stream:
+                delay = 1
+                async for change in stream:
+                    token = stream.resume_token
+                    op = change["operationType"]
+                    if op in CHANGE_OPS:
+                        fields = change.get("updateDescription", {}).get("updatedFields")
+                        bus.publish(CHANGE_OPS[op], name, [change["documentKey"]["_id"]], fields=fields)
+                    elif op in ("drop", "invalidate"):
+                        bus.publish("delete_all", name)
+                        token = None  # an invalidated stream cannot be resumed
+                        break
+        except PyMongoError as e:
+            print(f"Change stream error, retrying in {delay}s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+async def start_change_feed(db, bus):
+    """Feed `bus` from a change stream on db's collection.
+
+    Returns the feed task, or None when change streams are unavailable
+    (standalone mongod, memory backend); writes then keep publishing
+    from this process.
+    """
+    if getattr(db, "client", None) is None:
+        return None
+    hello = await db.client.admin.command("hello")
+    if "setName" not in hello and hello.get("msg") != "isdbgrid":
+        print("Change streams need a replica set; publishing events from this process instead")
+        return None
+    db.events = None  # the stream sees this process's writes too
+    return asyncio.create_task(follow_change_stream(db.collection, bus, db.collection_name))
@@ -0,0 +1,45 @@
+import json
+import os
+from datetime import datetime
+from bson import ObjectId, Decimal128
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional; stdlib json is the fallback
+    orjson = None
+
+# Opt-in: FAST_JSON=1 skips FastAPI's response_model validation + encoding
+FAST_JSON = os.getenv("FAST_JSON", "0") == "1"
+
+
+def _default(obj):
+    if isinstance(obj, (ObjectId, Decimal128)):
+        return str(obj)
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj) -> bytes:
+    """JSON bytes for dicts/lists that may hold ObjectId, datetime or Decimal128."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, default=_default, separators=(",", ":")).encode()
+
+
+def project(doc, fields):
+    """The response-model view of a Mongo document (only `fields`, in order)."""
+    return {field: doc.get(field) for field in fields}
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with `dumps`.
+
+    Returning one from a route skips FastAPI's response_model validation and
+    jsonable_encoder pass, while the declared response_model still drives
+    the OpenAPI schema. Callers must hand it data that already fits the model.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,133 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from passlib.context import CryptContext
+import metrics
+
+# Hashing pool config (override with environment variables)
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "0")) or os.cpu_count() or 1
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", "0")) or HASH_WORKERS * 8
+
+
+# Changing any of these makes needs_update() true for older hashes, which
+# triggers a rehash on the user's next successful login
+SCHEME_SETTINGS_ENV = {
+    "argon2": {"argon2__time_cost": "ARGON2_TIME_COST", "argon2__memory_cost": "ARGON2_MEMORY_COST"},
+    "bcrypt": {"bcrypt__rounds": "BCRYPT_ROUNDS"},
+}
+
+def _context(scheme):
+    settings = {
+        key: int(os.environ[env])
+        for key, env in SCHEME_SETTINGS_ENV[scheme].items()
+        if os.getenv(env)
+    }
+    return CryptContext(schemes=[scheme], deprecated="auto", **settings)
+
+CONTEXTS = {scheme: _context(scheme) for scheme in SCHEME_SETTINGS_ENV}
+
+
+class HashingOverloaded(Exception):
+    """Raised when more than HASH_MAX_PENDING hash jobs are already queued."""
+
+
+# --- WORKER FUNCTIONS (run in the pool processes) ---
+def _hash(scheme, password):
+    return CONTEXTS[scheme].hash(password)
+
+def _verify_and_update(scheme, password, hashed):
+    return CONTEXTS[scheme].verify_and_update(password, hashed)
+
+
+# --- EXECUTOR ---
+class HashingExecutor:
+    """Process pool for argon2/bcrypt work with an admission limit.
+
+    Hashing is CPU-bound by design; running it on the event loop (or in the
+    GIL-bound threadpool) stalls every other request. Jobs beyond
+    `max_pending` are rejected with HashingOverloaded instead of queueing
+    without bound.
+    """
+
+    def __init__(self, workers=HASH_WORKERS, max_pending=HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pool = None
+        self._pid = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.restarts = 0
+        self.total_seconds = 0.0
+
+    def _get_pool(self):
+        # Pools do not survive fork, so each worker process builds its own
+        if self._pool is None or self._pid != os.getpid():
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            self._pid = os.getpid()
+        return self._pool
+
+    def _replace_pool(self, broken):
+        # A child that dies (OOM kill, segfault) breaks the executor for
+        # good; drop it so the next _get_pool() starts a fresh one. Callers
+        # that saw the same broken pool concurrently only replace it once.
+        if self._pool is broken:
+            broken.shutdown(wait=False)
+            self._pool = None
+            self.restarts += 1
+
+    async def run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HashingOverloaded()
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            pool = self._get_pool()
+            try:
+                return await loop.run_in_executor(pool, fn, *args)
+            except BrokenProcessPool:
+                self._replace_pool(pool)
+                return await loop.run_in_executor(self._get_pool(), fn, *args)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.pending -= 1
+            self.completed += 1
+            self.total_seconds += elapsed
+            metrics.password_hash.observe(elapsed, fn.__name__.lstrip("_"))
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+            "avg_ms": 1000 * self.total_seconds / self.completed if self.completed else 0.0,
+        }
+
+    def shutdown(self):
+        if self._pool is not None and self._pid == os.getpid():
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+
+
+executor = HashingExecutor()
+metrics.register_stats("hashing", "Password hashing pool", executor.stats)
+
+
+async def hash_password_async(password: str, scheme: str = "argon2") -> str:
+    return await executor.run(_hash, scheme, password)
+
+async def verify_password_async(password: str, hashed: str, scheme: str = "argon2"):
+    """Returns (valid, new_hash). new_hash is set when the stored hash uses
+    outdated parameters and should be saved in place of `hashed`."""
+    return await executor.run(_verify_and_update, scheme, password, hashed)
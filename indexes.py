@@ -0,0 +1,164 @@
+"""Index bootstrap and query-plan check for every query shape the APIs issue.
+
+    python indexes.py ensure --db testDB
+    python indexes.py check --db testDB     # exits 1 if any shape plans a COLLSCAN
+    python indexes.py backfill --db testDB  # set name_key on documents that predate it
+"""
+import argparse
+import logging
+import sys
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from db_client import get_client
+from main import MongoCRUD, encode_cursor, page_query, prefix_query
+
+logger = logging.getLogger("indexes")
+
+# Keyset pagination sorts on (key, _id), so the student indexes carry _id as
+# a suffix; the same index then also serves equality/range lookups on key.
+INDEXES = {
+    "users": [
+        IndexModel([("username", ASCENDING)], unique=True, name="username_unique"),
+    ],
+    "students": [
+        IndexModel([("name", ASCENDING), ("_id", ASCENDING)], name="name_id"),
+        IndexModel([("name_key", ASCENDING), ("_id", ASCENDING)], name="name_key_id"),
+        IndexModel([("age", ASCENDING), ("_id", ASCENDING)], name="age_id"),
+        IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)], name="created_at_id"),
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+    ],
+}
+
+def _later_page(query, sort_key, value):
+    """("students", filter, sort) of a keyset page after a document with `value` at `sort_key`."""
+    after = encode_cursor({sort_key: value, "_id": ObjectId()}, sort_key, query)
+    return ("students", *page_query(query, after, sort_key))
+
+# (collection, filter, sort) for each query the routes send
+QUERY_SHAPES = [
+    ("users", {"username": "x"}, None),
+    ("students", {"_id": ObjectId()}, None),
+    ("students", {"name": "x"}, None),
+    ("students", {"_id": {"$in": [ObjectId()]}}, [("_id", ASCENDING)]),
+    ("students", {"name": {"$in": ["x"]}}, [("_id", ASCENDING)]),
+    ("students", {"age": {"$gt": 0}}, None),
+    ("students", prefix_query("x"), [("name_key", ASCENDING), ("_id", ASCENDING)]),
+    _later_page(prefix_query("x"), "name_key", "xa"),  # {"$and": [prefix, keyset $or]}
+    ("students", {}, [("_id", ASCENDING)]),
+    _later_page({}, "_id", None),
+    ("students", {}, [("name", ASCENDING), ("_id", ASCENDING)]),
+    _later_page({}, "name", "x"),  # keyset {"$or": [{name: {$gt}}, {name, _id: {$gt}}]}
+    ("students", {}, [("age", ASCENDING), ("_id", ASCENDING)]),
+    _later_page({}, "age", 20),
+    ("students", {}, [("created_at", ASCENDING), ("_id", ASCENDING)]),
+    _later_page({}, "created_at", datetime(2000, 1, 1)),
+    ("students", {"created_at": {"$gte": datetime(2000, 1, 1)}}, None),
+    ("students", {"$or": [
+        {"updated_at": {"$gte": datetime(2000, 1, 1)}},
+        {"created_at": {"$gte": datetime(2000, 1, 1)}},
+    ]}, None),
+]
+
+
+# A unique index cannot be built over existing duplicates (e.g. usernames
+# registered twice before username_unique existed). That index is skipped
+# and the colliding values are logged, so the app still starts; the other
+# indexes are created one by one so they do not depend on it.
+DUPLICATE_KEY_CODES = (11000, 11001)
+
+def _duplicates_pipeline(model, limit=20):
+    key = {field.replace(".", "_"): f"${field}" for field in model.document["key"]}
+    return [
+        {"$group": {"_id": key, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$sort": {"count": -1}},
+        {"$limit": limit},
+    ]
+
+def _is_duplicate_failure(model, error):
+    return model.document.get("unique", False) and error.code in DUPLICATE_KEY_CODES
+
+def _log_duplicates(name, model, duplicates):
+    collisions = ", ".join(f"{row['_id']} x{row['count']}" for row in duplicates)
+    logger.error("index %s on %s not created, existing documents collide: %s. "
+                 "Resolve them, then run `python indexes.py ensure`.", model.document["name"], name, collisions)
+    return f"{name}.{model.document['name']}"
+
+def ensure_indexes(db):
+    """Create every index; returns the unique indexes skipped over duplicates."""
+    skipped = []
+    for name, models in INDEXES.items():
+        for model in models:
+            try:
+                db[name].create_indexes([model])
+            except OperationFailure as e:
+                if not _is_duplicate_failure(model, e):
+                    raise
+                duplicates = list(db[name].aggregate(_duplicates_pipeline(model)))
+                skipped.append(_log_duplicates(name, model, duplicates))
+    return skipped
+
+async def ensure_indexes_async(db):
+    skipped = []
+    for name, models in INDEXES.items():
+        for model in models:
+            try:
+                await db[name].create_indexes([model])
+            except OperationFailure as e:
+                if not _is_duplicate_failure(model, e):
+                    raise
+                duplicates = await db[name].aggregate(_duplicates_pipeline(model)).to_list(length=None)
+                skipped.append(_log_duplicates(name, model, duplicates))
+    return skipped
+
+
+def _stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _stages(item)
+
+
+def check_query_plans(db):
+    """Return [(collection, filter, sort, stages)] for shapes whose winning plan scans the collection."""
+    failures = []
+    for name, query, sort in QUERY_SHAPES:
+        cursor = db[name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        winning = cursor.explain()["queryPlanner"]["winningPlan"]
+        stages = list(_stages(winning))
+        if "COLLSCAN" in stages:
+            failures.append((name, query, sort, stages))
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["ensure", "check", "backfill"])
+    parser.add_argument("--db", default="testDB")
+    args = parser.parse_args()
+
+    db = get_client()[args.db]
+    if args.command == "ensure":
+        skipped = ensure_indexes(db)
+        for index in skipped:
+            print(f"NOT CREATED: {index} (duplicate values, see the log above)")
+        print(f"Indexes ensured on {args.db}")
+        sys.exit(1 if skipped else 0)
+    if args.command == "backfill":
+        updated = MongoCRUD(db_name=args.db, collection_name="students").backfill_name_keys()
+        print(f"Backfilled name_key on {updated} students")
+        sys.exit(0)
+
+    failures = check_query_plans(db)
+    for name, query, sort, stages in failures:
+        print(f"COLLSCAN: {name}.find({query}) sort={sort} -> {' <- '.join(stages)}")
+    print(f"{len(QUERY_SHAPES) - len(failures)}/{len(QUERY_SHAPES)} query shapes use an index")
+    sys.exit(1 if failures else 0)
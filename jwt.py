@@ -1,13 +1,19 @@
-# pip install fastapi uvicorn python-jose[cryptography] passlib[bcrypt] pymongo python-multipart
+# pip install fastapi uvicorn python-jose[cryptography] passlib[bcrypt] pymongo motor python-multipart
 
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, status, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from pydantic import BaseModel
 from datetime import datetime, timedelta
 from typing import Optional
-from pymongo import MongoClient
+from contextlib import asynccontextmanager
+from storage import build_crud
+import metrics
+import profiling
+from pymongo.errors import DuplicateKeyError
+from user_cache import UserCache, TRUST_TOKEN_CLAIMS
+from hashing import hash_password_async, verify_password_async, executor as hashing_executor, HashingOverloaded
 from bson import ObjectId
 
 # ============================================
@@ -16,20 +22,34 @@ from bson import ObjectId
 SECRET_KEY = "bilalrafiquesecretkeyishere"  # Use environment variable
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+STUDENT_SORT_KEYS = {"_id", "name", "age", "created_at"}  # each backed by an index, see indexes.py
+STUDENT_PROJECTION = {"name_key": 0}  # internal search key, not part of the response
 
 # MongoDB Connection
-client = MongoClient("mongodb://localhost:27017/")
-db = client["school_db"]
-users_collection = db["users"]
-students_collection = db["students"]
-
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+db = build_crud(db_name="school_db", collection_name="students")
 
 # OAuth2 scheme for token
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await db.ping()
+    await db.ensure_indexes()
+    yield
+    db.close_connection()
+    hashing_executor.shutdown()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(metrics.MetricsMiddleware)
+profiling.install(app)  # no-op unless PROFILE_SAMPLE_RATE or PROFILE_TOKEN is set
+
+@app.exception_handler(HashingOverloaded)
+async def hashing_overloaded_handler(request: Request, exc: HashingOverloaded):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server busy, retry shortly"},
+        headers={"Retry-After": "1"}
+    )
 
 # ============================================
 # MODELS
@@ -43,7 +63,7 @@ class User(BaseModel):
 class UserInDB(BaseModel):
     username: str
     email: str
-    hashed_password: str
+    hashed_password: Optional[str] = None  # not set when built from token claims
     role: str
 
 class Student(BaseModel):
@@ -62,12 +82,6 @@ class TokenData(BaseModel):
 # ============================================
 # HELPER FUNCTIONS
 # ============================================
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -79,8 +93,16 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_user(username: str):
-    user = users_collection.find_one({"username": username})
+USER_PROJECTION = {"username": 1, "email": 1, "hashed_password": 1, "role": 1}
+
+user_cache = UserCache()
+metrics.register_stats("user_cache", "User cache", user_cache.stats)
+
+async def load_user(username: str):
+    return await db.find_user({"username": username}, USER_PROJECTION)
+
+async def get_user(username: str):
+    user = await user_cache.get(username, load_user)
     if user:
         return UserInDB(
             username=user["username"],
@@ -90,12 +112,17 @@ def get_user(username: str):
         )
     return None
 
-def authenticate_user(username: str, password: str):
-    user = get_user(username)
+async def authenticate_user(username: str, password: str):
+    user = await get_user(username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await verify_password_async(password, user.hashed_password, scheme="bcrypt")
+    if not valid:
         return False
+    if new_hash:
+        # Rehash transparently when the bcrypt rounds have changed
+        await db.update_user({"username": username}, {"hashed_password": new_hash})
+        user_cache.invalidate(username)
     return user
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
@@ -106,7 +133,8 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     )
     
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        with metrics.token_verify.time():
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
@@ -114,7 +142,10 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     except JWTError:
         raise credentials_exception
     
-    user = get_user(username=token_data.username)
+    if TRUST_TOKEN_CLAIMS and "email" in payload:
+        return UserInDB(username=username, email=payload["email"], role=payload.get("role", "user"))
+    
+    user = await get_user(username=token_data.username)
     if user is None:
         raise credentials_exception
     return user
@@ -125,7 +156,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
 @app.post("/register", status_code=status.HTTP_201_CREATED, tags=["REGISTER"])
 async def register(user: User):
     # Check if user already exists
-    if users_collection.find_one({"username": user.username}):
+    if await db.find_user({"username": user.username}, {"_id": 1}):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
@@ -135,16 +166,23 @@ async def register(user: User):
     user_dict = {
         "username": user.username,
         "email": user.email,
-        "hashed_password": get_password_hash(user.password),
+        "hashed_password": await hash_password_async(user.password, scheme="bcrypt"),
         "role": user.role,
         "created_at": datetime.utcnow()
     }
     
-    result = users_collection.insert_one(user_dict)
+    try:
+        user_id = await db.create_user(user_dict)
+    except DuplicateKeyError:  # a concurrent registration won the unique index
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already registered"
+        )
+    user_cache.invalidate(user.username)
     
     return {
         "message": "User registered successfully",
-        "user_id": str(result.inserted_id),
+        "user_id": str(user_id),
         "username": user.username
     }
 
@@ -153,7 +191,7 @@ async def register(user: User):
 # ============================================
 @app.post("/login", response_model=Token ,tags=["LOGIN"])
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = authenticate_user(form_data.username, form_data.password)
+    user = await authenticate_user(form_data.username, form_data.password)
     
     if not user:
         raise HTTPException(
@@ -165,7 +203,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username, "role": user.role},
+        data={"sub": user.username, "role": user.role, "email": user.email},
         expires_delta=access_token_expires
     )
     
@@ -197,25 +235,44 @@ async def create_student(
     student_dict["created_by"] = current_user.username
     student_dict["created_at"] = datetime.utcnow()
     
-    result = students_collection.insert_one(student_dict)
+    student_id = await db.create_one(student_dict)
     
     return {
         "message": "Student created successfully",
-        "student_id": str(result.inserted_id),
+        "student_id": str(student_id),
         "name": student.name
     }
 
 # Get all students (protected route)
 @app.get("/students", tags=["READ"])
-async def get_students(current_user: UserInDB = Depends(get_current_user)):
+async def get_students(
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[str] = None,
+    sort: str = "_id",
+    current_user: UserInDB = Depends(get_current_user)
+):
+    if sort not in STUDENT_SORT_KEYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cannot sort by '{sort}'"
+        )
+    try:
+        page, next_cursor = await db.read_page(limit=limit, after=after, sort_key=sort, projection=STUDENT_PROJECTION)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    
     students = []
-    for student in students_collection.find():
+    for student in page:
         student["_id"] = str(student["_id"])
         students.append(student)
     
     return {
         "students": students,
-        "count": len(students)
+        "count": await db.count(),
+        "next_cursor": next_cursor
     }
 
 # Get specific student (protected route)
@@ -225,7 +282,7 @@ async def get_student(
     current_user: UserInDB = Depends(get_current_user)
 ):
     try:
-        student = students_collection.find_one({"_id": ObjectId(student_id)})
+        student = await db.read_one({"_id": ObjectId(student_id)}, STUDENT_PROJECTION)
         if not student:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -248,9 +305,9 @@ async def update_student(
     current_user: UserInDB = Depends(get_current_user)
 ):
     try:
-        result = students_collection.update_one(
+        result = await db.update_one(
             {"_id": ObjectId(student_id)},
-            {"$set": student.dict()}
+            student.dict()
         )
         
         if result.matched_count == 0:
@@ -280,7 +337,7 @@ async def delete_student(
         )
     
     try:
-        result = students_collection.delete_one({"_id": ObjectId(student_id)})
+        result = await db.delete_one({"_id": ObjectId(student_id)})
         
         if result.deleted_count == 0:
             raise HTTPException(
@@ -295,6 +352,11 @@ async def delete_student(
             detail="Invalid student ID"
         )
 
+# Prometheus scrape endpoint (public, for monitoring)
+@app.get("/metrics", tags=["MONITORING"], response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.render_metrics(), media_type="text/plain; version=0.0.4")
+
 # Public route (no authentication required)
 @app.get("/")
 async def root():
@@ -304,8 +366,10 @@ async def root():
 # RUN SERVER
 # ============================================
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Multi-worker launcher; see serve.py for options (workers, reload, drain)
+    import sys
+    from serve import main
+    main(["jwt", *sys.argv[1:]])
 
 # ============================================
 # USAGE EXAMPLES WITH CURL/HTTPIE:
@@ -345,8 +409,9 @@ Headers: Authorization: Bearer <your-token>
 }
 
 5. Get all students (with token):
-GET http://localhost:8000/students
+GET http://localhost:8000/students?limit=100
 Headers: Authorization: Bearer <your-token>
+Next page: GET http://localhost:8000/students?limit=100&after=<next_cursor>
 
 6. Get specific student (with token):
 GET http://localhost:8000/students/<student_id>
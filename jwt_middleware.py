@@ -1,15 +1,34 @@
+import re
+from urllib.parse import parse_qs
 from fastapi import Request
 from fastapi.responses import JSONResponse
-from auth_utils import decode_access_token
+from starlette.requests import cookie_parser
+from auth_utils import decode_access_token_cached
 
 PUBLIC_PATHS = {
     "/register",
     "/token",
     "/docs",
     "/openapi.json",
-    "/redoc"
+    "/redoc",
+    "/metrics",
 }
 
+# EventSource cannot send an Authorization header, so these routes also take
+# the token from ?access_token= or an access_token cookie. Query strings end
+# up in access logs; prefer the cookie where the client can set one.
+TOKEN_PARAM_PATHS = {
+    "/students/events",
+}
+TOKEN_PARAM = "access_token"
+
+def token_from_params(query_string, cookie_header):
+    """The token from the access_token query parameter or cookie, or None."""
+    values = parse_qs(query_string).get(TOKEN_PARAM)
+    if values:
+        return values[0]
+    return cookie_parser(cookie_header).get(TOKEN_PARAM) if cookie_header else None
+
 async def jwt_middleware(request: Request, call_next):
     path = request.url.path
 
@@ -20,15 +39,19 @@ async def jwt_middleware(request: Request, call_next):
     # Protect students routes
     if path.startswith("/students") or path.startswith("/decode-token"):
         auth_header = request.headers.get("Authorization")
+        token = None
+        if auth_header and auth_header.startswith("Bearer "):
+            token = auth_header.split(" ")[1]
+        elif path in TOKEN_PARAM_PATHS:
+            token = token_from_params(request.url.query, request.headers.get("cookie"))
 
-        if not auth_header or not auth_header.startswith("Bearer "):
+        if not token:
             return JSONResponse(
                 status_code=401,
                 content={"detail": "Authorization token missing"}
             )
 
-        token = auth_header.split(" ")[1]
-        payload = decode_access_token(token)
+        payload = decode_access_token_cached(token)
 
         if not payload:
             return JSONResponse(
@@ -36,7 +59,62 @@ async def jwt_middleware(request: Request, call_next):
                 content={"detail": "Invalid or expired token"}
             )
 
-        # Attach payload to request
+        # Attach payload to request (get_current_user reuses it instead of decoding again)
         request.state.user = payload
 
     return await call_next(request)
+
+
+# --- PURE ASGI VERSION ---
+PROTECTED_PREFIXES = ("/students", "/decode-token")
+
+
+class JWTAuthMiddleware:
+    """Pure ASGI equivalent of `jwt_middleware`.
+
+    Avoids BaseHTTPMiddleware's per-request task and memory streams, so
+    streaming responses pass straight through. Verified claims are stored in
+    scope["state"]["user"], which is what `request.state.user` reads.
+    """
+
+    def __init__(self, app, public_paths=PUBLIC_PATHS, protected_prefixes=PROTECTED_PREFIXES,
+                 token_param_paths=TOKEN_PARAM_PATHS):
+        self.app = app
+        self.public_paths = frozenset(public_paths)
+        self.token_param_paths = frozenset(token_param_paths)
+        self.protected = re.compile("|".join(re.escape(p) for p in protected_prefixes))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        path = scope["path"]
+        if path in self.public_paths or not self.protected.match(path):
+            return await self.app(scope, receive, send)
+
+        auth_header = cookie_header = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                auth_header = value
+            elif name == b"cookie":
+                cookie_header = value
+
+        token = None
+        if auth_header and auth_header.startswith(b"Bearer "):
+            token = auth_header[7:].decode("latin-1")
+        elif path in self.token_param_paths:
+            token = token_from_params(scope["query_string"].decode("latin-1"),
+                                      cookie_header and cookie_header.decode("latin-1"))
+        if not token:
+            return await self._unauthorized("Authorization token missing", scope, receive, send)
+
+        payload = decode_access_token_cached(token)
+        if not payload:
+            return await self._unauthorized("Invalid or expired token", scope, receive, send)
+
+        scope.setdefault("state", {})["user"] = payload
+        await self.app(scope, receive, send)
+
+    async def _unauthorized(self, detail, scope, receive, send):
+        response = JSONResponse(status_code=401, content={"detail": detail})
+        await response(scope, receive, send)
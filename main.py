@@ -1,40 +1,329 @@
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+from pymongo import UpdateOne, DeleteOne, ReturnDocument
+from pymongo.errors import ConnectionFailure, BulkWriteError, DuplicateKeyError, WriteError
+from pymongo.results import UpdateResult, DeleteResult
 from datetime import datetime
+import asyncio
+import hashlib
+from bisect import bisect_right, insort
+from urllib.parse import unquote
 from bson import ObjectId
+from bson import json_util
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from db_client import get_client, get_async_client, close_clients
+from write_coalescer import WriteCoalescer
+
+
+# --- KEYSET PAGINATION ---
+def _query_hash(query):
+    return hashlib.sha1(json_util.dumps(query or {}, sort_keys=True).encode()).hexdigest()[:12]
+
+def encode_cursor(doc, sort_key="_id", query=None):
+    """Opaque `after` token pointing just past `doc` in (sort_key, _id) order.
+
+    It also records the sort key and a hash of the filter it was made for,
+    so it cannot be replayed against a different listing.
+    """
+    raw = json_util.dumps({"k": doc.get(sort_key), "id": doc["_id"], "s": sort_key, "q": _query_hash(query)})
+    return urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(token, sort_key="_id", query=None):
+    try:
+        data = json_util.loads(urlsafe_b64decode(token.encode()))
+        value, last_id, made_for = data["k"], data["id"], (data["s"], data["q"])
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if made_for != (sort_key, _query_hash(query)):
+        raise ValueError("Cursor belongs to a different sort or filter")
+    return value, last_id
+
+def page_query(query, after=None, sort_key="_id"):
+    """Build (filter, sort) for the page that starts after the `after` token."""
+    filter = dict(query or {})
+    if after:
+        value, last_id = decode_cursor(after, sort_key, query)
+        if sort_key == "_id":
+            keyset = {"_id": {"$gt": last_id}}
+        else:
+            keyset = {"$or": [
+                {sort_key: {"$gt": value}},
+                {sort_key: value, "_id": {"$gt": last_id}},
+            ]}
+        filter = {"$and": [filter, keyset]} if filter else keyset
+    sort = [("_id", 1)] if sort_key == "_id" else [(sort_key, 1), ("_id", 1)]
+    return filter, sort
+
+def page_projection(projection, sort_key="_id"):
+    """The cursor token needs the sort key, so keep it in any projection."""
+    if not projection:
+        return projection
+    if not any(v for k, v in projection.items() if k != "_id"):
+        # Exclusion projection: just don't exclude the sort key
+        return {k: v for k, v in projection.items() if k != sort_key}
+    if sort_key not in projection:
+        projection = {**projection, sort_key: 1}
+    return projection
+
+def split_page(docs, limit, sort_key="_id", query=None):
+    """docs was fetched with limit + 1; return (page, next_cursor or None)."""
+    if len(docs) > limit:
+        docs = docs[:limit]
+        return docs, encode_cursor(docs[-1], sort_key, query)
+    return docs, None
+
+
+# --- NAME SEARCH KEY ---
+# `name_key` is the casefolded name, kept in sync on every write so prefix
+# search is an indexed range query instead of a case-insensitive regex.
+def name_key(name):
+    return name.casefold()
+
+def with_name_key(doc):
+    if isinstance(doc.get("name"), str):
+        doc["name_key"] = name_key(doc["name"])
+    return doc
+
+def prefix_query(prefix):
+    """Range filter on name_key matching names that start with `prefix` (any case)."""
+    low = name_key(prefix)
+    if not low:
+        return {}
+    if ord(low[-1]) == 0x10FFFF:
+        return {"name_key": {"$gte": low}}
+    return {"name_key": {"$gte": low, "$lt": low[:-1] + chr(ord(low[-1]) + 1)}}
+
+def item_results(documents, error=None):
+    """Per-document outcome of an unordered insert_many, in input order."""
+    failed = {}
+    if error is not None:
+        for write_error in error.details.get("writeErrors", []):
+            failed[write_error["index"]] = write_error.get("errmsg", "write failed")
+    results = []
+    for index, doc in enumerate(documents):
+        if index in failed:
+            results.append({"ok": False, "error": failed[index]})
+        else:
+            results.append({"ok": True, "id": doc["_id"]})
+    return results
+
+def write_error(details):
+    """The exception insert_one would have raised for one writeErrors entry."""
+    code = details.get("code")
+    error = DuplicateKeyError if code in (11000, 11001) else WriteError
+    return error(details.get("errmsg", "write failed"), code, details)
+
+# Bulk ops are backend-neutral (kind, filter, update, upsert) tuples, kind
+# "update" or "delete"; each backend translates them for its own engine.
+def bulk_update(query, update, upsert=False):
+    return ("update", query, update, upsert)
+
+def bulk_delete(query):
+    return ("delete", query, None, False)
+
+# Bulk ops filter on exactly one of these (see bulk_op_to_write in mongo_api.py)
+BULK_FILTER_FIELDS = ("_id", "name")
+
+def pymongo_write(op):
+    kind, query, update, upsert = op
+    return DeleteOne(query) if kind == "delete" else UpdateOne(query, update, upsert=upsert)
+
+def new_bulk_totals():
+    return {"matched": 0, "modified": 0, "upserted": 0, "deleted": 0, "upserted_ids": {}, "errors": []}
+
+def merge_bulk_result(totals, raw, offset):
+    """Fold one chunk's raw bulk API result into totals; indexes become global."""
+    totals["matched"] += raw.get("nMatched", 0)
+    totals["modified"] += raw.get("nModified", 0)
+    totals["upserted"] += raw.get("nUpserted", 0)
+    totals["deleted"] += raw.get("nRemoved", 0)
+    for upsert in raw.get("upserted", []):
+        totals["upserted_ids"][offset + upsert["index"]] = upsert["_id"]
+    for write_error in raw.get("writeErrors", []):
+        totals["errors"].append({"index": offset + write_error["index"], "error": write_error.get("errmsg", "write failed")})
+    return totals
+
+def backfill_filter():
+    return {"name": {"$type": "string"}, "name_key": {"$exists": False}}
+
+
+# --- ROSTER STATISTICS ---
+# Stats come from one $facet pipeline, or (AsyncMongoCRUD with counters=True)
+# from a counters document kept in step with every write:
+# {_id: <collection>, total, city: {key: n}, created_by: {key: n}, age: {bucket: n}}
+AGE_BOUNDARIES = [0, 13, 18, 25, 35, 50, 65, 150]
+COUNTED_FIELDS = ("city", "created_by")
+COUNTER_PROJECTION = {"city": 1, "created_by": 1, "age": 1}
+
+def age_bucket(age):
+    """The $bucket id (lower boundary) `age` falls in, or "other"."""
+    if isinstance(age, (int, float)) and not isinstance(age, bool):
+        i = bisect_right(AGE_BOUNDARIES, age) - 1
+        if 0 <= i < len(AGE_BOUNDARIES) - 1:
+            return AGE_BOUNDARIES[i]
+    return "other"
+
+def stats_pipeline():
+    by_count = {"$sort": {"count": -1, "_id": 1}}
+    return [{"$facet": {
+        "total": [{"$count": "count"}],
+        "city": [{"$group": {"_id": "$city", "count": {"$sum": 1}}}, by_count],
+        "created_by": [{"$group": {"_id": "$created_by", "count": {"$sum": 1}}}, by_count],
+        "age": [{"$bucket": {
+            "groupBy": "$age", "boundaries": AGE_BOUNDARIES, "default": "other",
+            "output": {"count": {"$sum": 1}},
+        }}],
+    }}]
+
+# Field values become keys of the counters document, so they are escaped
+# ("." and "$" are not allowed in field names) and prefixed (keys must not be empty)
+def counter_key(value):
+    if value is None:
+        return "null"
+    return "v:" + str(value).replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+def counter_value(key):
+    return None if key == "null" else unquote(key[2:])
+
+def counter_inc(docs, sign=1):
+    """$inc document adding (sign=1) or removing (sign=-1) `docs` from the counters."""
+    inc = {}
+    for doc in docs:
+        paths = [f"{field}.{counter_key(doc.get(field))}" for field in COUNTED_FIELDS]
+        paths += ["total", f"age.{age_bucket(doc.get('age'))}"]
+        for path in paths:
+            inc[path] = inc.get(path, 0) + sign
+    return {path: n for path, n in inc.items() if n}
+
+def counters_from_facets(collection_name, facets):
+    doc = {"_id": collection_name, "total": facets["total"][0]["count"] if facets["total"] else 0}
+    for field in COUNTED_FIELDS:
+        doc[field] = {counter_key(row["_id"]): row["count"] for row in facets[field]}
+    doc["age"] = {str(row["_id"]): row["count"] for row in facets["age"]}
+    return doc
+
+def stats_from_counters(doc):
+    def rows(counts, label):
+        live = [(counter_value(key), n) for key, n in (counts or {}).items() if n > 0]
+        live.sort(key=lambda item: (-item[1], str(item[0])))
+        return [{label: value, "count": n} for value, n in live]
+    ages = doc.get("age") or {}
+    return {
+        "total": doc.get("total", 0),
+        "by_city": rows(doc.get("city"), "city"),
+        "by_creator": rows(doc.get("created_by"), "created_by"),
+        "age_distribution": [
+            {"bucket": bucket, "count": ages[str(bucket)]}
+            for bucket in AGE_BOUNDARIES[:-1] + ["other"] if ages.get(str(bucket), 0) > 0
+        ],
+    }
+
 
 class MongoCRUD:
-    def __init__(self, db_name="myDatabase", collection_name="students"):
+    def __init__(self, db_name="myDatabase", collection_name="students", client=None):
+        # The client is resolved lazily so importing an app never opens sockets;
+        # by default it comes from the shared per-process factory in db_client.
+        self._client = client
+        self.db_name = db_name
+        self.collection_name = collection_name
+
+    @property
+    def client(self):
+        return self._client if self._client is not None else get_client()
+
+    @property
+    def db(self):
+        return self.client[self.db_name]
+
+    @property
+    def collection(self):
+        return self.db[self.collection_name]
+
+    @property
+    def user_collection(self):
+        return self.db["users"]  # separate collection for auth users
+
+    def ping(self):
         try:
-            self.client = MongoClient("mongodb://localhost:27017/")
             self.client.admin.command('ping')
             print("Connected to MongoDB successfully")
-            self.db = self.client[db_name]
-            self.collection = self.db[collection_name]
-            self.user_collection = self.db["users"]  # separate collection for auth users
         except ConnectionFailure:
             print("Failed to connect to MongoDB")
 
     # --- STUDENT CRUD ---
     def create_one(self, document):
-        result = self.collection.insert_one(document)
+        result = self.collection.insert_one(with_name_key(document))
         return result.inserted_id
 
     def create_many(self, documents):
-        result = self.collection.insert_many(documents)
+        result = self.collection.insert_many([with_name_key(d) for d in documents])
         return result.inserted_ids
 
-    def read_all(self):
-        return list(self.collection.find())
+    def create_many_unordered(self, documents):
+        """Insert without stopping at the first failure; returns one result per document."""
+        documents = [with_name_key(d) for d in documents]
+        try:
+            self.collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            return item_results(documents, e)
+        return item_results(documents)
+
+    # `projection` limits the fields Mongo returns, e.g. {"name": 1, "age": 1}
+    def read_all(self, projection=None):
+        return list(self.collection.find({}, projection))
+
+    def read_one(self, query, projection=None):
+        return self.collection.find_one(query, projection)
 
-    def read_one(self, query):
-        return self.collection.find_one(query)
+    def read_many(self, query, projection=None):
+        return list(self.collection.find(query, projection))
 
-    def read_many(self, query):
-        return list(self.collection.find(query))
+    def read_in(self, field, values, projection=None):
+        """All documents whose `field` is in `values`, in one $in query (sorted by _id)."""
+        return list(self.collection.find({field: {"$in": list(values)}}, projection).sort("_id", 1))
+
+    def read_page(self, query=None, limit=100, after=None, sort_key="_id", projection=None):
+        """Keyset page: returns (docs, next_cursor); next_cursor is None on the last page."""
+        keyset_query, sort = page_query(query, after, sort_key)
+        projection = page_projection(projection, sort_key)
+        docs = list(self.collection.find(keyset_query, projection).sort(sort).limit(limit + 1))
+        return split_page(docs, limit, sort_key, query)
+
+    def iter_many(self, query=None, batch_size=500, projection=None):
+        """Stream matching documents without materializing the result."""
+        cursor = self.collection.find(query or {}, projection, batch_size=batch_size)
+        try:
+            for doc in cursor:
+                yield doc
+        finally:
+            cursor.close()
+
+    def count(self, query=None):
+        if not query:
+            return self.collection.estimated_document_count()
+        return self.collection.count_documents(query)
+
+    def aggregate(self, pipeline):
+        return list(self.collection.aggregate(pipeline))
+
+    def stats(self):
+        """Totals per city, creator and age bucket in one $facet pass."""
+        facets = self.aggregate(stats_pipeline())[0]
+        return stats_from_counters(counters_from_facets(self.collection_name, facets))
 
     def update_one(self, query, new_values):
-        return self.collection.update_one(query, {'$set': new_values})
+        return self.collection.update_one(query, {'$set': with_name_key(dict(new_values))})
+
+    def backfill_name_keys(self, batch_size=1000):
+        """Set name_key on documents written before it existed; returns the number updated."""
+        updated = 0
+        ops = []
+        for doc in self.iter_many(backfill_filter(), batch_size, {"name": 1}):
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"name_key": name_key(doc["name"])}}))
+            if len(ops) >= batch_size:
+                updated += self.collection.bulk_write(ops, ordered=False).modified_count
+                ops = []
+        if ops:
+            updated += self.collection.bulk_write(ops, ordered=False).modified_count
+        return updated
 
     def delete_one(self, query):
         return self.collection.delete_one(query)
@@ -42,13 +331,489 @@ class MongoCRUD:
     def delete_all(self):
         return self.collection.delete_many({})
 
+    def bulk_write(self, ops, ordered=False, chunk_size=1000):
+        """Run bulk_update/bulk_delete ops in chunks.
+
+        Returns aggregate matched/modified/upserted/deleted counts plus
+        per-op errors. With ordered=True the first error stops the run.
+        """
+        totals = new_bulk_totals()
+        ops = [pymongo_write(op) for op in ops]
+        for offset in range(0, len(ops), chunk_size):
+            try:
+                raw = self.collection.bulk_write(ops[offset:offset + chunk_size], ordered=ordered).bulk_api_result
+            except BulkWriteError as e:
+                merge_bulk_result(totals, e.details, offset)
+                if ordered:
+                    break
+                continue
+            merge_bulk_result(totals, raw, offset)
+        return totals
+
     # --- USER AUTH ---
     def create_user(self, user_doc):
         """user_doc: {username, email, password}"""
         return self.user_collection.insert_one(user_doc).inserted_id
 
-    def find_user(self, query):
-        return self.user_collection.find_one(query)
+    def find_user(self, query, projection=None):
+        return self.user_collection.find_one(query, projection)
+
+    def update_user(self, query, new_values):
+        return self.user_collection.update_one(query, {'$set': new_values})
     
     def close_connection(self):
-        self.client.close()
+        if self._client is not None:
+            self._client.close()
+        else:
+            close_clients()
+
+
+class AsyncMongoCRUD:
+    """Async mirror of MongoCRUD on the Motor driver, for use inside `async def` routes."""
+
+    def __init__(self, db_name="myDatabase", collection_name="students", client=None, cache=None, versioned=False,
+                 counters=False, coalesce=False, events=None):
+        self._client = client
+        self.db_name = db_name
+        self.collection_name = collection_name
+        self.cache = cache  # optional read_cache.ReadCache
+        # versioned: update_one bumps a per-document `_v` and every write bumps
+        # a per-collection version in `collection_versions` (used for ETags)
+        self.versioned = versioned
+        # counters: keep a per-collection counters document in `collection_stats`
+        # up to date on every write, so stats() is one find_one instead of a scan
+        self.counters = counters
+        # coalesce: create_one goes through a WriteCoalescer, so concurrent
+        # single inserts share one unordered insert_many round trip
+        self.coalescer = WriteCoalescer(self._insert_batch) if coalesce else None
+        self.events = events  # optional events.EventBus; every write publishes to it
+
+    @property
+    def client(self):
+        return self._client if self._client is not None else get_async_client()
+
+    @property
+    def db(self):
+        return self.client[self.db_name]
+
+    @property
+    def collection(self):
+        return self.db[self.collection_name]
+
+    @property
+    def user_collection(self):
+        return self.db["users"]  # separate collection for auth users
+
+    @property
+    def versions_collection(self):
+        return self.db["collection_versions"]
+
+    @property
+    def stats_collection(self):
+        return self.db["collection_stats"]
+
+    async def ping(self):
+        try:
+            await self.client.admin.command('ping')
+            print("Connected to MongoDB successfully")
+        except ConnectionFailure:
+            print("Failed to connect to MongoDB")
+
+    async def ensure_indexes(self):
+        from indexes import ensure_indexes_async  # indexes.py imports this module
+        return await ensure_indexes_async(self.db)
+
+    # --- READ CACHE HOOKS ---
+    # With a ReadCache attached, reads go through it and every write bumps
+    # the counters that key the affected entries (see read_cache.py).
+    # `version` is the collection_version() a caller tags the result with
+    # (list ETags). It is part of the cache key, so a version bumped by a
+    # write in another process misses here instead of reissuing the body
+    # cached under an older version with the new tag.
+    def _cached_query(self, kind, args, loader, version=None):
+        if version is not None:
+            args = (*args, version)
+        if self.cache is None:
+            return loader()
+        return self.cache.query(self.collection_name, kind, args, loader)
+
+    async def _target_id(self, query):
+        """_id of the document a single-document write will hit, or None."""
+        if set(query) == {"_id"}:
+            return query["_id"]
+        doc = await self.collection.find_one(query, {"_id": 1})
+        return doc["_id"] if doc else None
+
+    async def _written(self, doc_id=None, everything=False):
+        # Invalidate before bumping the version: a reader that sees the new
+        # version must not find the old body still cached
+        if self.cache is not None:
+            if everything:
+                await self.cache.invalidate_all(self.collection_name)
+            elif doc_id is not None:
+                await self.cache.invalidate_document(self.collection_name, str(doc_id))
+            else:
+                await self.cache.invalidate_queries(self.collection_name)
+        if self.versioned:
+            await self.versions_collection.update_one(
+                {"_id": self.collection_name}, {"$inc": {"version": 1}}, upsert=True)
+
+    def _publish(self, op, ids=(), count=None, fields=None):
+        if not ids and not count:
+            return  # nothing changed, e.g. every row of an insert failed
+        if self.events is not None:
+            self.events.publish(op, self.collection_name, ids, count, fields)
+
+    async def _write_one(self, query, write, op, fields=None):
+        # Pin the write to the document we will invalidate and announce
+        if self.cache is None and self.events is None:
+            result = await write(query)
+            await self._written()
+            return result
+        doc_id = await self._target_id(query)
+        if doc_id is not None and set(query) != {"_id"}:
+            query = {"$and": [query, {"_id": doc_id}]}
+        result = await write(query)
+        await self._written(doc_id)
+        if doc_id is not None and (result.deleted_count if op == "delete" else result.matched_count):
+            self._publish(op, [doc_id], fields=fields)
+        return result
+
+    # --- COUNTERS HOOKS (counters=True) ---
+    async def _inc_counters(self, inc):
+        if inc:
+            await self.stats_collection.update_one({"_id": self.collection_name}, {"$inc": inc}, upsert=True)
+
+    async def _count(self, docs, sign=1):
+        if self.counters:
+            await self._inc_counters(counter_inc(docs, sign))
+
+    async def _delete_counted(self, query):
+        # find_one_and_delete hands back what was removed, so the decrement is exact
+        doc = await self.collection.find_one_and_delete(query, projection=COUNTER_PROJECTION)
+        if doc is None:
+            return DeleteResult({"n": 0}, True)
+        await self._count([doc], -1)
+        return DeleteResult({"n": 1}, True)
+
+    async def _update_counted(self, query, update, upsert=False):
+        fields = set(update["$set"]) | set(COUNTER_PROJECTION)
+        before = await self.collection.find_one_and_update(
+            query, update, projection=dict.fromkeys(fields, 1), upsert=upsert,
+            return_document=ReturnDocument.BEFORE)
+        if before is None and upsert:
+            # Inserted: the new document is the filter's equality fields plus the update
+            inserted = {k: v for k, v in query.items() if not k.startswith("$") and not isinstance(v, dict)}
+            inserted.update(update.get("$setOnInsert", {}), **update["$set"])
+            await self._count([inserted])
+            return UpdateResult({"n": 0, "nModified": 0, "upserted": inserted.get("_id")}, True)
+        if before is None:
+            return UpdateResult({"n": 0, "nModified": 0}, True)
+        after = {**before, **update["$set"]}
+        modified = self.versioned or any(before.get(k) != v for k, v in update["$set"].items())
+        inc = counter_inc([after])
+        for path, n in counter_inc([before], -1).items():
+            inc[path] = inc.get(path, 0) + n
+        await self._inc_counters({path: n for path, n in inc.items() if n})
+        return UpdateResult({"n": 1, "nModified": int(modified)}, True)
+
+    async def rebuild_counters(self):
+        """Recount from the collection (one $facet scan) and replace the counters document."""
+        facets = (await self.collection.aggregate(stats_pipeline()).to_list(length=None))[0]
+        doc = counters_from_facets(self.collection_name, facets)
+        await self.stats_collection.replace_one({"_id": self.collection_name}, doc, upsert=True)
+        return doc
+
+    async def ensure_counters(self):
+        # Call at startup, before any write: the first $inc on a missing
+        # counters document would otherwise create one holding only its delta
+        if self.counters and await self.stats_collection.find_one({"_id": self.collection_name}, {"_id": 1}) is None:
+            await self.rebuild_counters()
+
+    async def _insert_batch(self, documents):
+        """Coalesced create_one calls: one _id or exception per document, in order."""
+        errors = {}
+        try:
+            await self.collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            errors = {w["index"]: w for w in e.details.get("writeErrors", [])}
+        finally:
+            await self._written()
+        await self._count([doc for i, doc in enumerate(documents) if i not in errors])
+        self._publish("insert", [doc["_id"] for i, doc in enumerate(documents) if i not in errors])
+        return [write_error(errors[i]) if i in errors else doc["_id"] for i, doc in enumerate(documents)]
+
+    # --- STUDENT CRUD ---
+    async def create_one(self, document):
+        if self.coalescer is not None:
+            return await self.coalescer.submit(with_name_key(document))
+        result = await self.collection.insert_one(with_name_key(document))
+        await self._count([document])
+        await self._written()
+        self._publish("insert", [result.inserted_id])
+        return result.inserted_id
+
+    async def create_many(self, documents):
+        documents = [with_name_key(d) for d in documents]
+        inserted = 0
+        try:
+            result = await self.collection.insert_many(documents)
+            inserted = len(documents)
+        except BulkWriteError as e:
+            # Ordered: the documents before the failing one were inserted
+            inserted = e.details.get("nInserted", 0)
+            raise
+        finally:
+            await self._written()
+            await self._count(documents[:inserted])
+            self._publish("insert", [doc["_id"] for doc in documents[:inserted]])
+        return result.inserted_ids
+
+    async def create_many_unordered(self, documents):
+        documents = [with_name_key(d) for d in documents]
+
+        async def insert():
+            try:
+                await self.collection.insert_many(documents, ordered=False)
+                results = item_results(documents)
+            except BulkWriteError as e:
+                results = item_results(documents, e)
+            finally:
+                await self._written()
+            await self._count([doc for doc, result in zip(documents, results) if result["ok"]])
+            self._publish("insert", [result["id"] for result in results if result["ok"]])
+            return results
+
+        # A cancelled insert_many may still commit; shielded, the insert runs
+        # to completion so what landed is always counted and published
+        return await asyncio.shield(insert())
+
+    async def read_all(self, projection=None):
+        return await self._cached_query(
+            "all", (projection,),
+            lambda: self.collection.find({}, projection).to_list(length=None))
+
+    async def read_one(self, query, projection=None):
+        loader = lambda: self.collection.find_one(query, projection)
+        if self.cache is not None and set(query) == {"_id"} and isinstance(query["_id"], ObjectId):
+            return await self.cache.document(self.collection_name, str(query["_id"]), projection, loader)
+        return await self._cached_query("one", (query, projection), loader)
+
+    async def read_many(self, query, projection=None, version=None):
+        return await self._cached_query(
+            "many", (query, projection),
+            lambda: self.collection.find(query, projection).to_list(length=None), version)
+
+    async def read_in(self, field, values, projection=None):
+        cursor = self.collection.find({field: {"$in": list(values)}}, projection).sort("_id", 1)
+        return await cursor.to_list(length=None)
+
+    async def read_page(self, query=None, limit=100, after=None, sort_key="_id", projection=None, version=None):
+        async def load():
+            keyset_query, sort = page_query(query, after, sort_key)
+            cursor = self.collection.find(keyset_query, page_projection(projection, sort_key))
+            docs = await cursor.sort(sort).limit(limit + 1).to_list(length=None)
+            return split_page(docs, limit, sort_key, query)
+        return await self._cached_query("page", (query, limit, after, sort_key, projection), load, version)
+
+    async def iter_many(self, query=None, batch_size=500, projection=None):
+        cursor = self.collection.find(query or {}, projection, batch_size=batch_size)
+        try:
+            async for doc in cursor:
+                yield doc
+        finally:
+            await cursor.close()
+
+    async def count(self, query=None):
+        if not query:
+            return await self.collection.estimated_document_count()
+        return await self.collection.count_documents(query)
+
+    async def aggregate(self, pipeline, version=None):
+        return await self._cached_query(
+            "aggregate", (pipeline,),
+            lambda: self.collection.aggregate(pipeline).to_list(length=None), version)
+
+    async def stats(self, fresh=False, version=None):
+        """Totals per city, creator and age bucket.
+
+        Read from the counters document when counters=True (rebuilt if
+        missing); otherwise, or with fresh=True, from a $facet pipeline.
+        """
+        if self.counters and not fresh:
+            doc = await self.stats_collection.find_one({"_id": self.collection_name})
+            return stats_from_counters(doc if doc is not None else await self.rebuild_counters())
+        facets = (await self.aggregate(stats_pipeline(), version))[0]
+        return stats_from_counters(counters_from_facets(self.collection_name, facets))
+
+    # --- VERSIONS (versioned=True) ---
+    # Read a version *before* the data it describes: a write landing in
+    # between then yields new data under an old tag, never the reverse.
+    async def collection_version(self):
+        doc = await self.versions_collection.find_one({"_id": self.collection_name})
+        return doc["version"] if doc else 0
+
+    async def document_version(self, query):
+        """(_id, _v) of the first document matching query, or None."""
+        doc = await self.collection.find_one(query, {"_v": 1})
+        return (doc["_id"], doc.get("_v", 0)) if doc else None
+
+    async def update_one(self, query, new_values):
+        update = {'$set': with_name_key(dict(new_values))}
+        if self.versioned:
+            update['$inc'] = {'_v': 1}
+        if self.counters and any(field in update['$set'] for field in COUNTER_PROJECTION):
+            return await self._write_one(query, lambda q: self._update_counted(q, update), "update", new_values)
+        return await self._write_one(query, lambda q: self.collection.update_one(q, update), "update", new_values)
+
+    async def backfill_name_keys(self, batch_size=1000):
+        updated = 0
+        ops = []
+        async for doc in self.iter_many(backfill_filter(), batch_size, {"name": 1}):
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"name_key": name_key(doc["name"])}}))
+            if len(ops) >= batch_size:
+                updated += (await self.collection.bulk_write(ops, ordered=False)).modified_count
+                ops = []
+        if ops:
+            updated += (await self.collection.bulk_write(ops, ordered=False)).modified_count
+        await self._written(everything=True)
+        return updated
+
+    async def delete_one(self, query):
+        delete = self._delete_counted if self.counters else self.collection.delete_one
+        return await self._write_one(query, delete, "delete")
+
+    async def delete_all(self):
+        """Delete every student.
+
+        With counters=True the counters are recounted afterwards instead of
+        zeroed, so inserts that land during the delete keep their counts.
+        Only a write landing between the recount and its replace_one can
+        still be lost; POST /students/stats/rebuild repairs that.
+        """
+        result = await self.collection.delete_many({})
+        if self.counters:
+            await self.rebuild_counters()
+        await self._written(everything=True)
+        self._publish("delete_all", count=result.deleted_count)
+        return result
+
+    async def _pin_counted(self, ops):
+        """Pin a chunk of bulk ops to the documents they will change.
+
+        One find fetches the pre-images; the chunk is then replayed against
+        them in order (so an op sees the effects of earlier ones) to choose
+        each op's target and its counter delta. Returns the pinned ops and
+        one $inc per op. A concurrent write to a target between the find and
+        the bulk write is not reflected in its delta.
+        """
+        for _, query, _, _ in ops:
+            field, value = next(iter(query.items())) if len(query) == 1 else (None, None)
+            if field not in BULK_FILTER_FIELDS or isinstance(value, dict):
+                raise ValueError(f"Counted bulk ops filter on one of {BULK_FILTER_FIELDS}, got {query!r}")
+        wanted = {field: [query[field] for _, query, _, _ in ops if field in query] for field in BULK_FILTER_FIELDS}
+        found = await self.collection.find(
+            {"$or": [{field: {"$in": values}} for field, values in wanted.items()]},
+            dict.fromkeys([*COUNTER_PROJECTION, *BULK_FILTER_FIELDS], 1)).to_list(length=None)
+
+        live = {}  # _id -> current image
+        by_name = {}  # name -> sorted [(position, _id)]; the first is what a name filter hits
+        positions = {}
+
+        def track(doc):
+            live[doc["_id"]] = doc
+            position = positions.setdefault(doc["_id"], len(positions))
+            insort(by_name.setdefault(doc.get("name"), []), (position, doc["_id"]))
+
+        def untrack(doc):
+            del live[doc["_id"]]
+            by_name[doc.get("name")].remove((positions[doc["_id"]], doc["_id"]))
+
+        for doc in found:
+            track(doc)
+        pinned, deltas = [], []
+        for kind, query, update, upsert in ops:
+            if "_id" in query:
+                target = live.get(query["_id"])
+            else:
+                named = by_name.get(query["name"])
+                target = live[named[0][1]] if named else None
+            if target is None and kind == "update" and upsert:
+                # Choose the _id up front so the inserted document can be counted
+                update = {**update, "$setOnInsert": {**update.get("$setOnInsert", {}), "_id": ObjectId()}}
+                inserted = {**query, **update["$setOnInsert"], **update["$set"]}
+                track(inserted)
+                pinned.append((kind, query, update, upsert))
+                deltas.append(counter_inc([inserted]))
+                continue
+            if target is None:
+                # Matches nothing now; keep it that way under concurrent inserts
+                pinned.append((kind, {"$and": [query, {"_id": {"$in": []}}]}, update, upsert))
+                deltas.append({})
+                continue
+            if "_id" not in query:
+                query = {"$and": [query, {"_id": target["_id"]}]}
+            pinned.append((kind, query, update, upsert))
+            inc = counter_inc([target], -1)
+            untrack(target)
+            if kind == "update":
+                after = {**target, **update["$set"]}
+                track(after)
+                for path, n in counter_inc([after]).items():
+                    inc[path] = inc.get(path, 0) + n
+            deltas.append({path: n for path, n in inc.items() if n})
+        return pinned, deltas
+
+    async def bulk_write(self, ops, ordered=False, chunk_size=1000):
+        totals = new_bulk_totals()
+        try:
+            for offset in range(0, len(ops), chunk_size):
+                chunk = ops[offset:offset + chunk_size]
+                if self.counters:
+                    chunk, deltas = await self._pin_counted(chunk)
+                try:
+                    result = await self.collection.bulk_write([pymongo_write(op) for op in chunk], ordered=ordered)
+                    raw = result.bulk_api_result
+                except BulkWriteError as e:
+                    raw = e.details
+                merge_bulk_result(totals, raw, offset)
+                failed = {write_error["index"] for write_error in raw.get("writeErrors", [])}
+                if self.counters:
+                    # Ordered runs stop at the first failed op
+                    applied = range(min(failed)) if ordered and failed else range(len(chunk))
+                    inc = {}
+                    for i in applied:
+                        if i not in failed:
+                            for path, n in deltas[i].items():
+                                inc[path] = inc.get(path, 0) + n
+                    await self._inc_counters({path: n for path, n in inc.items() if n})
+                if ordered and failed:
+                    break
+        finally:
+            # Raw ops do not say which documents they touch
+            await self._written(everything=True)
+        self._publish("bulk", count=totals["matched"] + totals["upserted"] + totals["deleted"])
+        return totals
+
+    # --- USER AUTH ---
+    async def create_user(self, user_doc):
+        """user_doc: {username, email, password}"""
+        result = await self.user_collection.insert_one(user_doc)
+        return result.inserted_id
+
+    async def find_user(self, query, projection=None):
+        return await self.user_collection.find_one(query, projection)
+
+    async def update_user(self, query, new_values):
+        return await self.user_collection.update_one(query, {'$set': new_values})
+
+    async def drain(self):
+        """Finish queued coalesced writes (call before close_connection)."""
+        if self.coalescer is not None:
+            await self.coalescer.drain()
+
+    def close_connection(self):
+        if self._client is not None:
+            self._client.close()
+        else:
+            close_clients()
@@ -0,0 +1,770 @@
+"""Embedded in-memory storage engine with the AsyncMongoCRUD interface.
+
+Selected with STORAGE_BACKEND=memory (see storage.py). Records are kept as
+BSON bytes; `name`/`username` have hash indexes and `age`/`name_key`/
+`created_at` sorted indexes. Queries support equality and the operators the
+routes send ($gt/$gte/$lt/$lte/$ne/$in/$nin/$exists/$type/$regex, $and/$or).
+Aggregation supports $match/$group/$bucket/$facet/$count/$sort/$limit.
+
+With MEMORY_STORE_PATH set, every write is appended to `<path>.log` and the
+data is compacted into `<path>.snapshot` every MEMORY_SNAPSHOT_EVERY writes
+and on close. State lives in one process: run a single worker with it.
+"""
+import logging
+import os
+import re
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timezone
+import bson
+from bson import ObjectId, json_util
+from pymongo.errors import DuplicateKeyError
+from pymongo.results import UpdateResult, DeleteResult
+from main import (
+    with_name_key, name_key, backfill_filter, page_query, page_projection, split_page,
+    new_bulk_totals, stats_pipeline, counters_from_facets, stats_from_counters,
+)
+
+logger = logging.getLogger("memory_store")
+
+# Memory store config (override with environment variables)
+MEMORY_STORE_PATH = os.getenv("MEMORY_STORE_PATH", "")  # empty = no persistence
+MEMORY_SNAPSHOT_EVERY = int(os.getenv("MEMORY_SNAPSHOT_EVERY", "10000"))
+
+# collection name -> {field: "hash" | "sorted"}
+INDEXES = {
+    "students": {"name": "sorted", "age": "sorted", "name_key": "sorted", "created_at": "sorted"},
+    "users": {"username": "hash"},
+}
+UNIQUE = {"users": {"username"}}
+
+
+class DuplicateKey(DuplicateKeyError):
+    """Raised like pymongo's, so callers catch one DuplicateKeyError for both backends."""
+
+
+# --- VALUE ORDERING ---
+# Mongo only compares values within a type bracket; the rank keeps e.g.
+# {"age": {"$gt": 5}} from matching strings and makes mixed keys sortable.
+def _rank(value):
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 5
+    if isinstance(value, (int, float)):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, ObjectId):
+        return 3
+    if isinstance(value, datetime):
+        return 4
+    return 6
+
+def _naive(value):
+    # Stored datetimes come back from bson.decode naive (in UTC), but query
+    # values such as ?created_since=...Z parse timezone-aware
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _sort_key(value):
+    rank, value = _rank(value), _naive(value)
+    return (rank, value if rank < 6 else str(value))
+
+def _compare(op, value, arg):
+    if value is _MISSING or _rank(value) != _rank(arg):
+        return False
+    value, arg = _naive(value), _naive(arg)
+    if op == "$gt":
+        return value > arg
+    if op == "$gte":
+        return value >= arg
+    if op == "$lt":
+        return value < arg
+    return value <= arg
+
+
+# --- QUERY MATCHING ---
+_MISSING = object()
+_TYPES = {"string": str, "int": int, "double": float, "bool": bool, "date": datetime, "objectId": ObjectId}
+
+def _equals(value, arg):
+    if isinstance(value, list) and not isinstance(arg, list):
+        return _naive(arg) in value
+    return value == _naive(arg) if value is not _MISSING else arg is None
+
+def _match_op(op, value, arg, options=""):
+    if op == "$eq":
+        return _equals(value, arg)
+    if op == "$ne":
+        return not _equals(value, arg)
+    if op in ("$gt", "$gte", "$lt", "$lte"):
+        return _compare(op, value, arg)
+    if op == "$in":
+        return any(_equals(value, a) for a in arg)
+    if op == "$nin":
+        return not any(_equals(value, a) for a in arg)
+    if op == "$exists":
+        return (value is not _MISSING) == bool(arg)
+    if op == "$type":
+        return isinstance(value, _TYPES[arg]) and not (arg != "bool" and isinstance(value, bool))
+    if op == "$regex":
+        flags = re.IGNORECASE if "i" in options else 0
+        return isinstance(value, str) and re.search(arg, value, flags) is not None
+    if op == "$options":
+        return True
+    raise ValueError(f"Unsupported query operator {op}")
+
+def matches(doc, query):
+    for key, cond in query.items():
+        if key == "$and":
+            if not all(matches(doc, q) for q in cond):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, q) for q in cond):
+                return False
+        else:
+            value = doc.get(key, _MISSING)
+            if isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+                options = cond.get("$options", "")
+                if not all(_match_op(op, value, arg, options) for op, arg in cond.items()):
+                    return False
+            elif not _equals(value, cond):
+                return False
+    return True
+
+
+def apply_projection(doc, projection):
+    if not projection:
+        return doc
+    if any(projection.values()):
+        # Inclusion, even when _id is the only field named; _id is kept unless excluded
+        include = {k for k, v in projection.items() if v} | ({"_id"} if projection.get("_id", 1) else set())
+        return {k: v for k, v in doc.items() if k in include}
+    return {k: v for k, v in doc.items() if k not in projection}
+
+
+def apply_update(doc, update, inserting=False):
+    for op, fields in update.items():
+        if op == "$set" or (op == "$setOnInsert" and inserting):
+            doc.update(fields)
+        elif op == "$inc":
+            for k, v in fields.items():
+                doc[k] = doc.get(k, 0) + v
+        elif op == "$unset":
+            for k in fields:
+                doc.pop(k, None)
+        elif op != "$setOnInsert":
+            raise ValueError(f"Unsupported update operator {op}")
+    return doc
+
+
+# --- AGGREGATION ---
+def _expr(doc, expr):
+    if isinstance(expr, str) and expr.startswith("$"):
+        return doc.get(expr[1:])
+    if isinstance(expr, dict):
+        return {k: _expr(doc, v) for k, v in expr.items()}
+    return expr
+
+def _accumulate(docs, output):
+    out = {}
+    for name, spec in output.items():
+        (op, arg), = spec.items()
+        values = [_expr(d, arg) for d in docs]
+        numbers = [v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool)]
+        if op == "$sum":
+            out[name] = sum(numbers)
+        elif op == "$avg":
+            out[name] = sum(numbers) / len(numbers) if numbers else None
+        elif op in ("$min", "$max"):
+            present = [v for v in values if v is not None]
+            pick = min if op == "$min" else max
+            out[name] = pick(present, key=_sort_key) if present else None
+        else:
+            raise ValueError(f"Unsupported accumulator {op}")
+    return out
+
+def _group(docs, spec):
+    groups = {}
+    for doc in docs:
+        key = _expr(doc, spec["_id"])
+        groups.setdefault(json_util.dumps(key, sort_keys=True), (key, []))[1].append(doc)
+    output = {k: v for k, v in spec.items() if k != "_id"}
+    return [{"_id": key, **_accumulate(members, output)} for key, members in groups.values()]
+
+def _bucket(docs, spec):
+    boundaries = spec["boundaries"]
+    buckets = {}
+    for doc in docs:
+        value = _expr(doc, spec["groupBy"])
+        i = bisect_right(boundaries, value) - 1 if _rank(value) == _rank(boundaries[0]) else -1
+        if 0 <= i < len(boundaries) - 1:
+            key = boundaries[i]
+        elif "default" in spec:
+            key = spec["default"]
+        else:
+            raise ValueError(f"$bucket value {value!r} is outside the boundaries and no default is set")
+        buckets.setdefault(key, []).append(doc)
+    output = spec.get("output", {"count": {"$sum": 1}})
+    order = [b for b in boundaries[:-1] if b in buckets] + ([spec["default"]] if spec.get("default") in buckets else [])
+    return [{"_id": key, **_accumulate(buckets[key], output)} for key in order]
+
+def run_pipeline(docs, pipeline):
+    """Evaluate an aggregation pipeline over decoded documents."""
+    for stage in pipeline:
+        (op, spec), = stage.items()
+        if op == "$match":
+            docs = [d for d in docs if matches(d, spec)]
+        elif op == "$group":
+            docs = _group(docs, spec)
+        elif op == "$bucket":
+            docs = _bucket(docs, spec)
+        elif op == "$facet":
+            docs = [{name: run_pipeline(docs, sub) for name, sub in spec.items()}]
+        elif op == "$count":
+            docs = [{spec: len(docs)}] if docs else []
+        elif op == "$sort":
+            for field, direction in reversed(list(spec.items())):
+                docs = sorted(docs, key=lambda d: _sort_key(d.get(field)), reverse=direction < 0)
+        elif op == "$limit":
+            docs = docs[:spec]
+        else:
+            raise ValueError(f"Unsupported pipeline stage {op}")
+    return docs
+
+
+# --- SECONDARY INDEXES ---
+class HashIndex:
+    def __init__(self):
+        self.entries = {}  # value -> set of _id
+
+    def add(self, value, _id):
+        self.entries.setdefault(_sort_key(value), set()).add(_id)
+
+    def remove(self, value, _id):
+        ids = self.entries.get(_sort_key(value))
+        if ids:
+            ids.discard(_id)
+            if not ids:
+                del self.entries[_sort_key(value)]
+
+    def lookup(self, cond):
+        if isinstance(cond, dict):
+            if set(cond) == {"$in"}:
+                return set().union(*(self.entries.get(_sort_key(v), ()) for v in cond["$in"]))
+            if set(cond) == {"$eq"}:
+                cond = cond["$eq"]
+            else:
+                return None
+        return set(self.entries.get(_sort_key(cond), ()))
+
+
+class SortedIndex:
+    def __init__(self):
+        self.entries = []  # sorted [(rank, value, _id)]
+
+    def add(self, value, _id):
+        insort(self.entries, (*_sort_key(value), _id))
+
+    def remove(self, value, _id):
+        entry = (*_sort_key(value), _id)
+        i = bisect_left(self.entries, entry)
+        if i < len(self.entries) and self.entries[i] == entry:
+            del self.entries[i]
+
+    def lookup(self, cond):
+        if isinstance(cond, dict) and set(cond) == {"$in"}:
+            ranges = [self.range(v) for v in cond["$in"]]
+            if any(entries is None for entries in ranges):
+                return None
+            return {entry[2] for entries in ranges for entry in entries}
+        entries = self.range(cond)
+        return {entry[2] for entry in entries} if entries is not None else None
+
+    def walk(self, after=None):
+        """_ids in index order, starting past the (rank, value, _id) key `after`."""
+        start = bisect_right(self.entries, after) if after is not None else 0
+        return (self.entries[i][2] for i in range(start, len(self.entries)))
+
+    def range(self, cond):
+        """Entries matching a range `cond`, in index order, or None if it is not a range."""
+        if not isinstance(cond, dict):
+            cond = {"$gte": cond, "$lte": cond}
+        bounds = {k: v for k, v in cond.items() if k in ("$gt", "$gte", "$lt", "$lte", "$eq")}
+        if not bounds or len(bounds) != len(cond):
+            return None
+        if "$eq" in bounds:
+            bounds = {"$gte": bounds["$eq"], "$lte": bounds["$eq"]}
+        # Keys are (rank, value, _id): a bare (rank, value) sorts before every
+        # entry with that value, (rank, value, _MAX_ID) after all of them.
+        # A one-sided range stays inside the bound's type bracket.
+        rank = _rank(next(iter(bounds.values())))
+        low = bisect_left(self.entries, (rank,))
+        high = bisect_left(self.entries, (rank + 1,))
+        if "$gte" in bounds:
+            low = max(low, bisect_left(self.entries, _sort_key(bounds["$gte"])))
+        if "$gt" in bounds:
+            low = max(low, bisect_right(self.entries, (*_sort_key(bounds["$gt"]), _MAX_ID)))
+        if "$lte" in bounds:
+            high = min(high, bisect_right(self.entries, (*_sort_key(bounds["$lte"]), _MAX_ID)))
+        if "$lt" in bounds:
+            high = min(high, bisect_left(self.entries, _sort_key(bounds["$lt"])))
+        return self.entries[low:high]
+
+
+_MAX_ID = ObjectId("f" * 24)
+
+
+# --- COLLECTIONS ---
+class MemoryCollection:
+    def __init__(self, name, store):
+        self.name = name
+        self.store = store
+        self.records = {}  # _id -> BSON bytes
+        self.ids = SortedIndex()  # _id order, for the default sort and _id ranges
+        self.version = 0  # bumped by every change; persisted, so list ETags survive restarts
+        short = name.rsplit(".", 1)[-1]
+        self.unique = UNIQUE.get(short, set())
+        self.indexes = {
+            field: HashIndex() if kind == "hash" else SortedIndex()
+            for field, kind in INDEXES.get(short, {}).items()
+        }
+
+    # storage
+    def _index(self, doc, add=True):
+        # A missing field is indexed as null, where Mongo matches and sorts it
+        for field, index in self.indexes.items():
+            (index.add if add else index.remove)(doc.get(field), doc["_id"])
+
+    def get(self, _id):
+        raw = self.records.get(_id)
+        return bson.decode(raw) if raw is not None else None
+
+    def put(self, doc, log=True):
+        old = self.get(doc["_id"])
+        for field in self.unique:
+            if field in doc and (old is None or old.get(field) != doc[field]):
+                if self.indexes[field].lookup(doc[field]):
+                    raise DuplicateKey(f"E11000 duplicate key error: {field}: {doc[field]!r}")
+        if old is not None:
+            self._index(old, add=False)
+        else:
+            self.ids.add(doc["_id"], doc["_id"])
+        self.records[doc["_id"]] = bson.encode(doc)
+        self._index(doc)
+        self.version += 1
+        if log:
+            self.store.log({"c": self.name, "op": "put", "doc": doc})
+
+    def remove(self, _id, log=True):
+        old = self.get(_id)
+        if old is None:
+            return False
+        self._index(old, add=False)
+        self.ids.remove(_id, _id)
+        del self.records[_id]
+        self.version += 1
+        if log:
+            self.store.log({"c": self.name, "op": "del", "_id": _id})
+        return True
+
+    def clear(self, log=True):
+        count = len(self.records)
+        self.records.clear()
+        self.ids = SortedIndex()
+        for field in list(self.indexes):
+            self.indexes[field] = type(self.indexes[field])()
+        self.version += 1
+        if log:
+            self.store.log({"c": self.name, "op": "clear"})
+        return count
+
+    # queries
+    def _candidates(self, query):
+        """_ids that may match `query`, or None for all of them.
+
+        A list is already in _id order (an _id range); sets are not.
+        """
+        clauses = [query] + list(query.get("$and", []))
+        for clause in clauses:
+            for field, cond in clause.items():
+                if field == "_id" and not isinstance(cond, dict):
+                    return {cond}
+                if field == "_id" and set(cond) == {"$in"}:
+                    return set(cond["$in"])
+                if field == "_id":
+                    entries = self.ids.range(cond)
+                    if entries is not None:
+                        return [entry[2] for entry in entries]
+                    continue
+                index = self.indexes.get(field)
+                if index is not None:
+                    ids = index.lookup(cond)
+                    if ids is not None:
+                        return ids
+        return None
+
+    def _sort_index(self, sort):
+        """The SortedIndex whose order is `sort` ((field, 1) with an _id tie-break), or None."""
+        sort = list(sort or [("_id", 1)])
+        field, direction = sort[0]
+        if direction != 1 or sort[1:] not in ([], [("_id", 1)]):
+            return None
+        index = self.ids if field == "_id" else self.indexes.get(field)
+        return index if isinstance(index, SortedIndex) else None
+
+    @staticmethod
+    def _keyset_after(query, field):
+        """The index key a page_query() keyset clause on `field` starts after, or None."""
+        for clause in [query] + list(query.get("$and", [])):
+            keyset = clause.get("$or")
+            try:
+                value, last_id = keyset[1][field], keyset[1]["_id"]["$gt"]
+            except (TypeError, KeyError, IndexError):
+                continue
+            if keyset == [{field: {"$gt": value}}, {field: value, "_id": {"$gt": last_id}}]:
+                return (*_sort_key(value), last_id)
+        return None
+
+    def find(self, query=None, sort=None, limit=0):
+        query = query or {}
+        ids = self._candidates(query)
+        index = self._sort_index(sort)
+        if index is None:
+            docs = (self.get(i) for i in (ids if ids is not None else list(self.records)))
+            found = [d for d in docs if d is not None and matches(d, query)]
+            for field, direction in reversed(sort):
+                found.sort(key=lambda d: _sort_key(d.get(field)), reverse=direction < 0)
+            return found[:limit] if limit else found
+        # Walk the ids in sort order and stop decoding at `limit` matches.
+        # _id ranges are already candidates; other keysets start the walk.
+        after = None if index is self.ids else self._keyset_after(query, sort[0][0])
+        if index is self.ids and ids is not None:
+            ids = ids if isinstance(ids, list) else sorted(ids, key=_sort_key)
+        elif ids is not None:
+            allowed = set(ids)
+            ids = (i for i in index.walk(after) if i in allowed)
+        else:
+            ids = index.walk(after)
+        found = []
+        for _id in ids:
+            doc = self.get(_id)
+            if doc is not None and matches(doc, query):
+                found.append(doc)
+                if len(found) == limit:
+                    break
+        return found
+
+    def find_one(self, query):
+        if set(query) == {"_id"} and not isinstance(query["_id"], dict):
+            doc = self.get(query["_id"])
+            return doc if doc is not None and matches(doc, query) else None
+        found = self.find(query, limit=1)
+        return found[0] if found else None
+
+    def insert(self, doc):
+        doc.setdefault("_id", ObjectId())
+        if doc["_id"] in self.records:
+            raise DuplicateKey(f"E11000 duplicate key error: _id: {doc['_id']!r}")
+        self.put(doc)
+        return doc["_id"]
+
+    def update(self, query, update, upsert=False):
+        """Returns (matched, modified, upserted_id)."""
+        doc = self.find_one(query)
+        if doc is None:
+            if not upsert:
+                return 0, 0, None
+            seed = {k: v for k, v in query.items() if not k.startswith("$") and not isinstance(v, dict)}
+            new = apply_update(seed, update, inserting=True)
+            return 0, 0, self.insert(new)
+        before = bson.encode(doc)
+        apply_update(doc, update)
+        if bson.encode(doc) == before:
+            return 1, 0, None
+        self.put(doc)
+        return 1, 1, None
+
+
+class MemoryStore:
+    """All collections of one process, with optional snapshot + append-log files."""
+
+    def __init__(self, path=MEMORY_STORE_PATH, snapshot_every=MEMORY_SNAPSHOT_EVERY):
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.collections = {}
+        self._log = None
+        self._since_snapshot = 0
+        if path:
+            self._load()
+            self._log = open(f"{path}.log", "a", encoding="utf-8")
+
+    def collection(self, name):
+        if name not in self.collections:
+            self.collections[name] = MemoryCollection(name, self)
+        return self.collections[name]
+
+    def log(self, entry):
+        if self._log is None:
+            return
+        self._log.write(json_util.dumps(entry) + "\n")
+        self._log.flush()
+        self._since_snapshot += 1
+        if self._since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def _load(self):
+        if os.path.exists(f"{self.path}.snapshot"):
+            with open(f"{self.path}.snapshot", encoding="utf-8") as f:
+                for line in f:
+                    entry = json_util.loads(line)
+                    if "version" in entry:
+                        self.collection(entry["c"]).version = entry["version"]
+                    else:
+                        self.collection(entry["c"]).put(entry["doc"], log=False)
+        if os.path.exists(f"{self.path}.log"):
+            with open(f"{self.path}.log", "rb") as f:
+                lines = f.readlines()
+            good = 0  # bytes of complete entries
+            for i, line in enumerate(lines):
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("unterminated entry")
+                    entry = json_util.loads(line.decode("utf-8")) if line.strip() else None
+                except ValueError:
+                    if i < len(lines) - 1:
+                        raise  # damage before the end is not a torn append
+                    # A crash mid-append tears the last entry; it was never
+                    # acknowledged, so drop it before appending after it
+                    logger.warning("dropping a torn last entry from %s.log", self.path)
+                    with open(f"{self.path}.log", "r+b") as f:
+                        f.truncate(good)
+                    break
+                good += len(line)
+                if entry is None:
+                    continue
+                coll = self.collection(entry["c"])
+                if entry["op"] == "put":
+                    coll.put(entry["doc"], log=False)
+                elif entry["op"] == "del":
+                    coll.remove(entry["_id"], log=False)
+                elif entry["op"] == "clear":
+                    coll.clear(log=False)
+
+    def snapshot(self):
+        """Write every record to `<path>.snapshot` atomically and truncate the log."""
+        if not self.path:
+            return
+        tmp = f"{self.path}.snapshot.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for name, coll in self.collections.items():
+                for raw in coll.records.values():
+                    f.write(json_util.dumps({"c": name, "doc": bson.decode(raw)}) + "\n")
+                # After the documents, whose replay bumps the version
+                f.write(json_util.dumps({"c": name, "version": coll.version}) + "\n")
+        os.replace(tmp, f"{self.path}.snapshot")
+        if self._log is not None:
+            self._log.close()
+        self._log = open(f"{self.path}.log", "w", encoding="utf-8")
+        self._since_snapshot = 0
+
+    def close(self):
+        if self._log is not None:
+            self.snapshot()
+            self._log.close()
+            self._log = None
+
+
+_store = None
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = MemoryStore()
+    return _store
+
+def close_store():
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
+
+
+# --- CRUD FACADE ---
+class MemoryCRUD:
+    """AsyncMongoCRUD interface on the in-memory engine; routes use it unchanged."""
+
+    def __init__(self, db_name="myDatabase", collection_name="students", store=None, versioned=False, events=None):
+        self._store = store
+        self.db_name = db_name
+        self.collection_name = collection_name
+        self.versioned = versioned
+        self.cache = None  # nothing to gain from a read cache in front of memory
+        self.counters = False  # a stats scan is already an in-memory pass
+        self.coalescer = None  # inserts have no round trip to amortize
+        self.events = events
+
+    @property
+    def store(self):
+        return self._store if self._store is not None else get_store()
+
+    @property
+    def collection(self):
+        return self.store.collection(f"{self.db_name}.{self.collection_name}")
+
+    @property
+    def user_collection(self):
+        return self.store.collection(f"{self.db_name}.users")
+
+    async def ping(self):
+        print("Using in-memory storage" + (f" persisted at {self.store.path}" if self.store.path else ""))
+
+    async def ensure_indexes(self):
+        pass  # indexes are built in, see INDEXES
+
+    async def ensure_counters(self):
+        pass  # stats are always computed from the documents
+
+    def _written(self, op=None, ids=(), count=None, fields=None):
+        if not ids and not count:
+            return  # nothing changed, e.g. every row of an insert failed
+        if op is not None and self.events is not None:
+            self.events.publish(op, self.collection_name, ids, count, fields)
+
+    # --- STUDENT CRUD ---
+    async def create_one(self, document):
+        inserted_id = self.collection.insert(with_name_key(document))
+        self._written("insert", [inserted_id])
+        return inserted_id
+
+    async def create_many(self, documents):
+        ids = [self.collection.insert(with_name_key(d)) for d in documents]
+        self._written("insert", ids)
+        return ids
+
+    async def create_many_unordered(self, documents):
+        results = []
+        for doc in documents:
+            try:
+                results.append({"ok": True, "id": self.collection.insert(with_name_key(doc))})
+            except DuplicateKey as e:
+                results.append({"ok": False, "error": str(e)})
+        self._written("insert", [result["id"] for result in results if result["ok"]])
+        return results
+
+    async def read_all(self, projection=None):
+        return [apply_projection(d, projection) for d in self.collection.find()]
+
+    async def read_one(self, query, projection=None):
+        doc = self.collection.find_one(query)
+        return apply_projection(doc, projection) if doc is not None else None
+
+    async def read_many(self, query, projection=None, version=None):
+        return [apply_projection(d, projection) for d in self.collection.find(query)]
+
+    async def read_in(self, field, values, projection=None):
+        return await self.read_many({field: {"$in": list(values)}}, projection)
+
+    async def read_page(self, query=None, limit=100, after=None, sort_key="_id", projection=None, version=None):
+        keyset_query, sort = page_query(query, after, sort_key)
+        docs = self.collection.find(keyset_query, sort=sort, limit=limit + 1)
+        projection = page_projection(projection, sort_key)
+        return split_page([apply_projection(d, projection) for d in docs], limit, sort_key, query)
+
+    async def iter_many(self, query=None, batch_size=500, projection=None):
+        for doc in self.collection.find(query or {}):
+            yield apply_projection(doc, projection)
+
+    async def count(self, query=None):
+        if not query:
+            return len(self.collection.records)
+        return len(self.collection.find(query))
+
+    async def aggregate(self, pipeline, version=None):
+        return run_pipeline(self.collection.find(), pipeline)
+
+    async def stats(self, fresh=False, version=None):
+        facets = (await self.aggregate(stats_pipeline()))[0]
+        return stats_from_counters(counters_from_facets(self.collection_name, facets))
+
+    async def collection_version(self):
+        return self.collection.version
+
+    async def document_version(self, query):
+        doc = self.collection.find_one(query)
+        return (doc["_id"], doc.get("_v", 0)) if doc else None
+
+    async def update_one(self, query, new_values):
+        update = {"$set": with_name_key(dict(new_values))}
+        if self.versioned:
+            update["$inc"] = {"_v": 1}
+        doc = self.collection.find_one(query)
+        if doc is None:
+            return UpdateResult({"n": 0, "nModified": 0}, True)
+        matched, modified, _ = self.collection.update({"_id": doc["_id"]}, update)
+        self._written("update", [doc["_id"]], fields=new_values)
+        return UpdateResult({"n": matched, "nModified": modified}, True)
+
+    async def backfill_name_keys(self, batch_size=1000):
+        updated = 0
+        for doc in self.collection.find(backfill_filter()):
+            doc["name_key"] = name_key(doc["name"])
+            self.collection.put(doc)
+            updated += 1
+        return updated
+
+    async def delete_one(self, query):
+        doc = self.collection.find_one(query)
+        deleted = self.collection.remove(doc["_id"]) if doc else False
+        if deleted:
+            self._written("delete", [doc["_id"]])
+        return DeleteResult({"n": int(deleted)}, True)
+
+    async def delete_all(self):
+        count = self.collection.clear()
+        self._written("delete_all", count=count)
+        return DeleteResult({"n": count}, True)
+
+    async def bulk_write(self, ops, ordered=False, chunk_size=1000):
+        totals = new_bulk_totals()
+        for index, (kind, query, update, upsert) in enumerate(ops):
+            try:
+                if kind == "update":
+                    matched, modified, upserted_id = self.collection.update(query, update, upsert)
+                    totals["matched"] += matched
+                    totals["modified"] += modified
+                    if upserted_id is not None:
+                        totals["upserted"] += 1
+                        totals["upserted_ids"][index] = upserted_id
+                elif kind == "delete":
+                    doc = self.collection.find_one(query)
+                    if doc is not None and self.collection.remove(doc["_id"]):
+                        totals["deleted"] += 1
+                else:
+                    raise ValueError(f"Unsupported bulk op {kind!r}")
+            except (DuplicateKey, ValueError) as e:
+                totals["errors"].append({"index": index, "error": str(e)})
+                if ordered:
+                    break
+        self._written("bulk", count=totals["matched"] + totals["upserted"] + totals["deleted"])
+        return totals
+
+    # --- USER AUTH ---
+    async def create_user(self, user_doc):
+        """user_doc: {username, email, password}"""
+        return self.user_collection.insert(user_doc)
+
+    async def find_user(self, query, projection=None):
+        doc = self.user_collection.find_one(query)
+        return apply_projection(doc, projection) if doc is not None else None
+
+    async def update_user(self, query, new_values):
+        matched, modified, _ = self.user_collection.update(query, {"$set": new_values})
+        return UpdateResult({"n": matched, "nModified": modified}, True)
+
+    async def drain(self):
+        pass
+
+    def close_connection(self):
+        close_store()
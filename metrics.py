@@ -0,0 +1,196 @@
+"""In-process metrics rendered in the Prometheus text format on GET /metrics."""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pymongo import monitoring
+from starlette.routing import Match
+
+# Metrics config (override with environment variables)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))  # 0 disables the slow-query log
+
+# Write payloads (which include password hashes) and session noise stay out of the slow log
+UNLOGGED_FIELDS = {"documents", "updates", "lsid", "$clusterTime", "$db"}
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+logger = logging.getLogger("metrics")
+_registry = []
+_collectors = []
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                yield f"{self.name}{_labels(self.label_names, labels)} {value}"
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, seconds, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[i] += 1
+            series[-2] += seconds
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    yield f"{self.name}_bucket{_labels(self.label_names, labels, ('le', bound))} {count}"
+                yield f"{self.name}_bucket{_labels(self.label_names, labels, ('le', '+Inf'))} {series[-1]}"
+                yield f"{self.name}_sum{_labels(self.label_names, labels)} {series[-2]}"
+                yield f"{self.name}_count{_labels(self.label_names, labels)} {series[-1]}"
+
+
+def register_collector(collect):
+    """`collect()` returns [(name, help, value)] gauges read at scrape time."""
+    _collectors.append(collect)
+
+
+def register_stats(prefix, help, stats):
+    """Expose the numeric fields of a `stats()` dict as `<prefix>_<field>` gauges."""
+    register_collector(lambda: [
+        (f"{prefix}_{name}", f"{help} {name.replace('_', ' ')}", int(value) if isinstance(value, bool) else value)
+        for name, value in stats().items() if isinstance(value, (int, float))
+    ])
+
+
+def render_metrics():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        for name, help, value in collect():
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+# --- METRICS ---
+http_requests = Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route", "status"))
+token_verify = Histogram("token_verify_duration_seconds", "JWT signature verification time")
+password_hash = Histogram("password_hash_duration_seconds", "Password hash/verify time incl. pool queueing", ("op",))
+mongo_commands = Histogram("mongo_command_duration_seconds", "MongoDB command latency", ("command", "outcome"))
+slow_queries = Counter("mongo_slow_commands_total", "MongoDB commands slower than SLOW_QUERY_MS", ("command",))
+
+
+# --- MONGO COMMANDS ---
+class CommandMetrics(monitoring.CommandListener):
+    """Times every command MongoCRUD issues; logs the slow ones."""
+
+    def __init__(self, slow_ms=SLOW_QUERY_MS):
+        self.slow_ms = slow_ms
+        self._started = {}  # request_id -> command document, kept only for the slow log
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if self.slow_ms:
+            with self._lock:
+                self._started[event.request_id] = (event.database_name, {
+                    k: v for k, v in event.command.items() if k not in UNLOGGED_FIELDS
+                })
+
+    def _finished(self, event, outcome):
+        seconds = event.duration_micros / 1e6
+        mongo_commands.observe(seconds, event.command_name, outcome)
+        if not self.slow_ms:
+            return
+        with self._lock:
+            started = self._started.pop(event.request_id, None)
+        if seconds * 1000 >= self.slow_ms:
+            slow_queries.inc(event.command_name)
+            database, command = started or ("?", {})
+            logger.warning("slow mongo command %s on %s took %.1f ms: %r",
+                           event.command_name, database, seconds * 1000, command)
+
+    def succeeded(self, event):
+        self._finished(event, "ok")
+
+    def failed(self, event):
+        self._finished(event, "error")
+
+
+command_metrics = CommandMetrics()
+
+
+# --- HTTP ---
+def route_template(app, scope):
+    """Path template ("/students/id/{id}") so labels do not grow per id."""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    for route in app.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording http_request_duration_seconds."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests.observe(
+                time.perf_counter() - start,
+                scope["method"], route_template(scope["app"], scope), status["code"],
+            )
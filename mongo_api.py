@@ -3,15 +3,63 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm,HTT
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
-from main import MongoCRUD
-from auth_utils import hash_password, verify_password, create_access_token, decode_access_token
+import asyncio
+import hashlib
+import json
+import zlib
+from contextlib import asynccontextmanager
+from main import prefix_query, with_name_key, new_bulk_totals, bulk_update, bulk_delete
+from storage import build_crud, STORAGE_BACKEND, STATS_COUNTERS
+from user_cache import UserCache, TRUST_TOKEN_CLAIMS
+from read_cache import build_read_cache
+from write_coalescer import WRITE_COALESCE
+import events
+from fast_json import FAST_JSON, FastJSONResponse, dumps, project
+from auth_utils import create_access_token, decode_access_token_cached
+from hashing import hash_password_async, verify_password_async, executor as hashing_executor, HashingOverloaded
 from bson import ObjectId
-from jwt_middleware import jwt_middleware
-from fastapi import Request
-
-app = FastAPI(title="MongoDB CRUD + JWT Authentication")
-app.middleware("http")(jwt_middleware)
-db = MongoCRUD(db_name="testDB", collection_name="students")
+from jwt_middleware import JWTAuthMiddleware
+import metrics
+import profiling
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from fastapi import Request, Response
+from starlette.requests import ClientDisconnect
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
+
+read_cache = build_read_cache() if STORAGE_BACKEND == "mongo" else None
+db = build_crud(
+    db_name="testDB", collection_name="students", cache=read_cache, versioned=True,
+    counters=STATS_COUNTERS, coalesce=WRITE_COALESCE, events=events.bus,
+)
+# Cache and coalescer stats are gauges on /metrics (pool, token cache,
+# hashing and events stats register themselves)
+if read_cache is not None:
+    metrics.register_stats("read_cache", "Read cache", read_cache.stats)
+if db.coalescer is not None:
+    metrics.register_stats("write_coalescer", "Write coalescer", db.coalescer.stats)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Client is created here, i.e. inside each worker process after fork
+    await db.ping()
+    await db.ensure_indexes()
+    await db.ensure_counters()
+    change_feed = await events.start_change_feed(db, events.bus) if events.EVENTS_SOURCE == "changestream" else None
+    yield
+    if change_feed is not None:
+        change_feed.cancel()
+    await db.drain()
+    db.close_connection()
+    hashing_executor.shutdown()
+
+app = FastAPI(title="MongoDB CRUD + JWT Authentication", lifespan=lifespan)
+app.add_middleware(JWTAuthMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)  # outermost, so auth time is included
+profiling.install(app)  # no-op unless PROFILE_SAMPLE_RATE or PROFILE_TOKEN is set
+
+@app.exception_handler(HashingOverloaded)
+async def hashing_overloaded_handler(request: Request, exc: HashingOverloaded):
+    return JSONResponse(status_code=503, content={"detail": "Server busy, retry shortly"}, headers={"Retry-After": "1"})
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -58,6 +106,21 @@ class UpdateStudent(BaseModel):
     city: Optional[str] = None
     email: Optional[str] = None
 
+class BulkOp(BaseModel):
+    action: str                 # "update", "upsert" or "delete"
+    id: Optional[str] = None    # target by id ...
+    name: Optional[str] = None  # ... or by name
+    values: Optional[UpdateStudent] = None  # update: the fields to change
+    student: Optional[Student] = None       # upsert: the whole student, inserted when `name` matches none
+
+class BulkRequest(BaseModel):
+    ops: List[BulkOp]
+    ordered: bool = False
+
+class LookupRequest(BaseModel):
+    ids: List[str] = []
+    names: List[str] = []
+
 class User(BaseModel):
     username: str
     email: str
@@ -68,6 +131,57 @@ class Token(BaseModel):
     token_type: str
 
 # --- HELPERS ---
+def projection_for(model):
+    """Mongo projection holding only the fields a response model exposes."""
+    fields = getattr(model, "model_fields", None) or model.__fields__
+    return {name: 1 for name in fields}
+
+STUDENT_PROJECTION = projection_for(Student)
+AUTH_USER_PROJECTION = {"username": 1, "password": 1}
+LOGIN_USER_PROJECTION = {"username": 1, "email": 1, "password": 1}
+
+VERSIONED_PROJECTION = {**STUDENT_PROJECTION, "_v": 1}
+
+# --- ETAGS ---
+# Lists are tagged with the collection version plus the request path/query,
+# single records with their _id and per-document _v.
+def list_etag(request: Request, version):
+    digest = hashlib.sha1(f"{request.url.path}?{request.url.query}".encode()).hexdigest()[:16]
+    return f'"c{version}-{digest}"'
+
+def doc_etag(doc_id, version):
+    return f'"{doc_id}-{version}"'
+
+def etag_matches(request: Request, etag):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return "*" in tags or etag in tags
+
+def not_modified(etag):
+    return Response(status_code=304, headers={"ETag": etag})
+
+# --- RESPONSES ---
+# With FAST_JSON on, student routes encode documents straight to JSON bytes
+# and skip FastAPI's per-item response_model revalidation; the model still
+# documents the schema and the projection guarantees the same fields.
+STUDENT_FIELDS = list(STUDENT_PROJECTION)
+
+def passthrough_headers(response: Response):
+    return {k: v for k, v in response.headers.items() if k not in ("content-length", "content-type")}
+
+def students_response(response: Response, students):
+    if FAST_JSON:
+        rows = [project(s, STUDENT_FIELDS) for s in students]
+        return FastJSONResponse(rows, headers=passthrough_headers(response))
+    return [student_helper(s) for s in students]
+
+def student_response(response: Response, student):
+    if FAST_JSON:
+        return FastJSONResponse(project(student, STUDENT_FIELDS), headers=passthrough_headers(response))
+    return student_helper(student)
+
 def student_helper(student):
     if not student:
         return None
@@ -83,13 +197,22 @@ def student_helper(student):
 # --- AUTH DEPENDENCY ---
 bearer_scheme = HTTPBearer()
 
+user_cache = UserCache()
+metrics.register_stats("user_cache", "User cache", user_cache.stats)
+
+async def load_user(username):
+    return await db.find_user({"username": username}, AUTH_USER_PROJECTION)
+
 # Update get_current_user dependency
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
+async def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
     token = credentials.credentials
-    payload = decode_access_token(token)
+    # jwt_middleware already verified this token for protected paths
+    payload = getattr(request.state, "user", None) or decode_access_token_cached(token)
     if payload is None:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
-    user = db.find_user({"username": payload.get("sub")})
+    if TRUST_TOKEN_CLAIMS:
+        return {"username": payload.get("sub"), "email": payload.get("email")}
+    user = await user_cache.get(payload.get("sub"), load_user)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     return user
@@ -99,19 +222,30 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(bearer_
 
 # --- AUTH ROUTES ---
 @app.post("/register", response_model=dict, tags=["AUTHENTICATION"])
-def register(user: User):
-    existing_user = db.find_user({"username": user.username})
+async def register(user: User):
+    existing_user = await db.find_user({"username": user.username}, {"_id": 1})
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already exists")
-    hashed_pwd = hash_password(user.password)
-    db.create_user({"username": user.username, "email": user.email, "password": hashed_pwd})
+    hashed_pwd = await hash_password_async(user.password)
+    try:
+        await db.create_user({"username": user.username, "email": user.email, "password": hashed_pwd})
+    except DuplicateKeyError:  # a concurrent registration won the unique index
+        raise HTTPException(status_code=400, detail="Username already exists")
+    user_cache.invalidate(user.username)
     return {"message": f"User {user.username} created successfully"}
 
 @app.post("/token", response_model=Token, tags=["AUTHENTICATION"])
-def login(user: User):
-    db_user = db.find_user({"username": user.username})
-    if not db_user or not verify_password(user.password, db_user["password"]):
+async def login(user: User):
+    db_user = await db.find_user({"username": user.username}, LOGIN_USER_PROJECTION)
+    if not db_user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    valid, new_hash = await verify_password_async(user.password, db_user["password"])
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        # Hash parameters changed since this password was stored
+        await db.update_user({"_id": db_user["_id"]}, {"password": new_hash})
+        user_cache.invalidate(db_user["username"])
     
     # Include username and email in token
     access_token = create_access_token(username=db_user["username"], email=db_user["email"])
@@ -123,116 +257,498 @@ def login(user: User):
 # --- STUDENT CRUD ROUTES (JWT Protected) ---
 
 # READ
+STUDENT_SORT_KEYS = {"_id", "name", "age", "created_at"}  # each backed by an index, see indexes.py
+
 @app.get("/students/", response_model=List[Student], tags=["READ"])
-def get_all_students(request: Request):
-    return [student_helper(s) for s in db.read_all()]
+async def get_all_students(
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[str] = None,
+    sort: str = "_id",
+):
+    # Keyset pagination: pass the X-Next-Cursor header back as `after` for the next page
+    if sort not in STUDENT_SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by '{sort}'")
+    version = await db.collection_version()
+    etag = list_etag(request, version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    try:
+        students, next_cursor = await db.read_page(
+            limit=limit, after=after, sort_key=sort, projection=STUDENT_PROJECTION, version=version
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    response.headers["X-Total-Count"] = str(await db.count())
+    response.headers["ETag"] = etag
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return students_response(response, students)
 
 
 @app.get("/students/name/{name}", response_model=Student, tags=["READ"])
-def get_student_by_name(name: str, request: Request):
-    student = db.read_one({"name": name})
+async def get_student_by_name(name: str, request: Request, response: Response):
+    if request.headers.get("if-none-match"):
+        current = await db.document_version({"name": name})
+        if current and etag_matches(request, doc_etag(*current)):
+            return not_modified(doc_etag(*current))
+    student = await db.read_one({"name": name}, VERSIONED_PROJECTION)
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
-    return student_helper(student)
+    response.headers["ETag"] = doc_etag(student["_id"], student.get("_v", 0))
+    return student_response(response, student)
 
 
 @app.get("/students/id/{id}", response_model=Student, tags=["READ"])
-def get_student_by_id(id: str, request: Request):
-    student = db.read_one({"_id": ObjectId(id)})
+async def get_student_by_id(id: str, request: Request, response: Response):
+    if request.headers.get("if-none-match"):
+        current = await db.document_version({"_id": ObjectId(id)})
+        if current and etag_matches(request, doc_etag(*current)):
+            return not_modified(doc_etag(*current))
+    student = await db.read_one({"_id": ObjectId(id)}, VERSIONED_PROJECTION)
     if not student:
         raise HTTPException(status_code=404, detail="Student ID not found")
-    return student_helper(student)
+    response.headers["ETag"] = doc_etag(student["_id"], student.get("_v", 0))
+    return student_response(response, student)
 
 
 @app.get("/students/filter/age", response_model=List[Student], tags=["READ"])
-def get_students_by_age(min_age: int, request: Request):
-    students = db.read_many({"age": {"$gt": min_age}})
+async def get_students_by_age(min_age: int, request: Request, response: Response):
+    version = await db.collection_version()
+    etag = list_etag(request, version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    students = await db.read_many({"age": {"$gt": min_age}}, STUDENT_PROJECTION, version=version)
     if not students:
         raise HTTPException(status_code=404, detail="No students found")
-    return [student_helper(s) for s in students]
+    response.headers["ETag"] = etag
+    return students_response(response, students)
 
 
 @app.get("/students/filter/name", response_model=List[Student], tags=["READ"])
-def get_students_by_name_starts(letter: str, request: Request):
-    students = db.read_many({
-        "name": {"$regex": f"^{letter}", "$options": "i"}
-    })
+async def get_students_by_name_starts(
+    letter: str,
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[str] = None,
+):
+    # Case-insensitive prefix match as an indexed range on the casefolded name_key
+    if not letter:
+        raise HTTPException(status_code=400, detail="Prefix must not be empty")
+    version = await db.collection_version()
+    etag = list_etag(request, version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    try:
+        students, next_cursor = await db.read_page(
+            prefix_query(letter), limit=limit, after=after,
+            sort_key="name_key", projection=STUDENT_PROJECTION, version=version
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     if not students:
         raise HTTPException(
             status_code=404,
             detail=f"No students found starting with {letter}"
         )
-    return [student_helper(s) for s in students]
+    response.headers["ETag"] = etag
+    return students_response(response, students)
+
+
+@app.get("/students/stats", tags=["STATS"])
+async def get_student_stats(request: Request, response: Response, fresh: bool = False):
+    """Totals per city, per creator and per age bucket.
+
+    Served from the incrementally maintained counters when STATS_COUNTERS=1;
+    `fresh=true` recomputes them with an aggregation pipeline instead.
+    """
+    version = await db.collection_version()
+    etag = list_etag(request, version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    stats = await db.stats(fresh=fresh, version=version)
+    response.headers["ETag"] = etag
+    return stats
+
+
+@app.post("/students/stats/rebuild", tags=["STATS"])
+async def rebuild_student_stats(request: Request):
+    # Repairs counter drift, e.g. after documents were edited outside the API
+    if not db.counters:
+        raise HTTPException(status_code=409, detail="Stats counters are not enabled")
+    await db.rebuild_counters()
+    return await db.stats()
+
+
+LOOKUP_MAX_ITEMS = 1000
+
+@app.post("/students/lookup", tags=["READ"])
+async def lookup_students(body: LookupRequest, request: Request):
+    """Fetch many students by id and/or name in at most one query per key.
+
+    Results keep the request order; an unknown or malformed key yields a
+    per-item error instead of failing the whole call.
+    """
+    if len(body.ids) + len(body.names) > LOOKUP_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {LOOKUP_MAX_ITEMS} ids/names per lookup")
+
+    valid_ids = [ObjectId(i) for i in body.ids if ObjectId.is_valid(i)]
+    by_id, by_name = {}, {}
+    if valid_ids:
+        for doc in await db.read_in("_id", valid_ids, STUDENT_PROJECTION):
+            by_id[str(doc["_id"])] = doc
+    if body.names:
+        # Names are not unique; like /students/name/{name}, return the first match
+        for doc in await db.read_in("name", body.names, STUDENT_PROJECTION):
+            by_name.setdefault(doc["name"], doc)
+
+    results = []
+    for i in body.ids:
+        if not ObjectId.is_valid(i):
+            results.append({"id": i, "error": "Invalid ObjectId"})
+        elif str(ObjectId(i)) not in by_id:
+            results.append({"id": i, "error": "Student ID not found"})
+        else:
+            results.append({"id": i, "student": student_helper(by_id[str(ObjectId(i))])})
+    for name in body.names:
+        if name not in by_name:
+            results.append({"name": name, "error": "Student not found"})
+        else:
+            results.append({"name": name, "student": student_helper(by_name[name])})
+    return {"results": results, "missing": sum(1 for r in results if "error" in r)}
+
+
+# EVENTS (Server-Sent Events: one push per write instead of polling GET /students/)
+# EventSource clients pass the token as ?access_token= or a cookie, see jwt_middleware.TOKEN_PARAM_PATHS
+@app.get("/students/events", tags=["READ"])
+async def student_events(request: Request):
+    last_event_id = request.headers.get("last-event-id")
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events.sse_stream(events.bus, last_event_id), media_type="text/event-stream", headers=headers)
+
+
+# EXPORT (streamed NDJSON, constant memory regardless of collection size)
+@app.get("/students/export", tags=["READ"])
+async def export_students(
+    request: Request,
+    gzip: bool = False,
+    updated_since: Optional[datetime] = None,
+    created_since: Optional[datetime] = None,
+    batch_size: int = Query(1000, ge=1, le=10000),
+):
+    """Stream students as NDJSON (optionally gzipped).
+
+    `created_since`/`updated_since` are compared in UTC: timestamps are
+    stored in UTC, and a value without an offset is taken as UTC.
+    """
+    query = {}
+    if created_since:
+        query["created_at"] = {"$gte": created_since}
+    if updated_since:
+        query["$or"] = [
+            {"updated_at": {"$gte": updated_since}},
+            {"created_at": {"$gte": updated_since}},
+        ]
+
+    async def rows():
+        compressor = zlib.compressobj(wbits=31) if gzip else None  # wbits=31 -> gzip container
+        lines = []
+        async for doc in db.iter_many(query, batch_size=batch_size, projection=STUDENT_PROJECTION):
+            lines.append(dumps(student_helper(doc)))
+            if len(lines) >= batch_size:
+                chunk = b"\n".join(lines) + b"\n"
+                lines = []
+                yield compressor.compress(chunk) if compressor else chunk
+        chunk = b"\n".join(lines) + b"\n" if lines else b""
+        if compressor:
+            yield compressor.compress(chunk) + compressor.flush()
+        elif chunk:
+            yield chunk
+
+    headers = {"Content-Encoding": "gzip"} if gzip else {}
+    return StreamingResponse(rows(), media_type="application/x-ndjson", headers=headers)
 
 
 # CREATE
 @app.post("/students/", tags=["CREATE"])
-def create_student(student: Student, request: Request):
+async def create_student(student: Student, request: Request):
     user = request.state.user  # decoded JWT
     doc = student.dict()
-    doc["created_at"] = datetime.now()
+    doc["created_at"] = datetime.utcnow()
     doc["created_by"] = user["sub"]
 
-    inserted_id = db.create_one(doc)
+    inserted_id = await db.create_one(doc)
     return {"message": "Student created", "id": str(inserted_id)}
 
 
 @app.post("/students/batch", tags=["CREATE"])
-def create_students_batch(students: List[Student], request: Request):
+async def create_students_batch(students: List[Student], request: Request):
     user = request.state.user
 
     docs = []
     for s in students:
         doc = s.dict()
-        doc["created_at"] = datetime.now()
+        doc["created_at"] = datetime.utcnow()
         doc["created_by"] = user["sub"]
         docs.append(doc)
 
-    ids = db.create_many(docs)
+    ids = await db.create_many(docs)
     return {"message": f"{len(ids)} students inserted", "ids": [str(i) for i in ids]}
 
+
+INGEST_MAX_LINE = 64 * 1024  # bytes; one student is far smaller
+
+class IngestAborted(Exception):
+    """Stops reading an ingest body; rows already sent are still reported."""
+
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+@app.post("/students/ingest", tags=["CREATE"])
+async def ingest_students(
+    request: Request,
+    chunk_size: int = Query(1000, ge=1, le=10000),
+    concurrency: int = Query(4, ge=1, le=16),
+):
+    """Bulk load from an NDJSON body (one Student per line).
+
+    The body is read and validated incrementally; valid rows are sent in
+    unordered insert_many chunks, up to `concurrency` chunks in flight.
+    Returns one result per input line, so a bad row never aborts the rest.
+    A line longer than INGEST_MAX_LINE bytes (413) or a failed chunk (500)
+    stops reading: the chunks already sent still finish and are reported,
+    and `aborted` gives the first line that was not inserted.
+    """
+    user = request.state.user
+    results = []
+    chunk = []
+    in_flight = set()
+
+    async def insert_chunk(rows):
+        try:
+            outcomes = await db.create_many_unordered([doc for _, doc in rows])
+        except PyMongoError as e:
+            # Mongo did not say which rows, if any, landed
+            results.extend({"line": line, "error": f"Insert failed: {e}"} for line, _ in rows)
+            raise
+        for (line, _), outcome in zip(rows, outcomes):
+            if outcome["ok"]:
+                results.append({"line": line, "id": str(outcome["id"])})
+            else:
+                results.append({"line": line, "error": outcome["error"]})
+
+    async def add(line, raw):
+        nonlocal chunk, in_flight
+        if not raw.strip():
+            return
+        try:
+            doc = Student(**json.loads(raw)).dict()
+        except (ValueError, TypeError) as e:  # bad JSON or pydantic ValidationError
+            results.append({"line": line, "error": str(e)})
+            return
+        doc["created_at"] = datetime.utcnow()
+        doc["created_by"] = user["sub"]
+        chunk.append((line, doc))
+        if len(chunk) >= chunk_size:
+            if len(in_flight) >= concurrency:
+                # Backpressure: stop reading the body until a chunk lands
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if isinstance(task.exception(), PyMongoError):
+                        raise IngestAborted(500, f"Insert failed: {task.exception()}")
+                    task.result()  # anything else is a bug; let it surface
+            in_flight.add(asyncio.create_task(insert_chunk(chunk)))
+            chunk = []
+
+    def too_long():
+        return IngestAborted(413, f"Line {line + 1} is longer than {INGEST_MAX_LINE} bytes")
+
+    line = 0
+    aborted, first_unsent = None, None
+    partial, partial_size = [], 0  # pieces of the current line; only new bytes are scanned
+    try:
+        try:
+            async for data in request.stream():
+                start = 0
+                while (end := data.find(b"\n", start)) != -1:
+                    if partial_size + end - start > INGEST_MAX_LINE:
+                        raise too_long()
+                    partial.append(data[start:end])
+                    raw, partial, partial_size = b"".join(partial), [], 0
+                    line += 1
+                    await add(line, raw)
+                    start = end + 1
+                if start < len(data):
+                    partial.append(data[start:])
+                    partial_size += len(data) - start
+                    if partial_size > INGEST_MAX_LINE:
+                        raise too_long()
+            if partial:
+                line += 1
+                await add(line, b"".join(partial))
+            if chunk:
+                in_flight.add(asyncio.create_task(insert_chunk(chunk)))
+        except IngestAborted as e:
+            # Rows still waiting for a chunk were never sent
+            aborted, first_unsent = e, chunk[0][0] if chunk else line + 1
+        except ClientDisconnect:
+            # Nobody is left to report to, but let the sent chunks land
+            await asyncio.gather(*in_flight, return_exceptions=True)
+            raise
+        for outcome in await asyncio.gather(*in_flight, return_exceptions=True):
+            if isinstance(outcome, PyMongoError):
+                if aborted is None:
+                    aborted, first_unsent = IngestAborted(500, f"Insert failed: {outcome}"), line + 1
+            elif isinstance(outcome, BaseException):
+                raise outcome
+    except BaseException:
+        # Cancelled (e.g. shutdown): create_many_unordered shields the inserts
+        for task in in_flight:
+            task.cancel()
+        raise
+
+    results.sort(key=lambda r: r["line"])
+    inserted = sum(1 for r in results if "id" in r)
+    body = {
+        "message": f"{inserted} students inserted, {len(results) - inserted} failed",
+        "inserted": inserted,
+        "failed": len(results) - inserted,
+        "results": results,
+    }
+    if aborted is not None:
+        body["detail"] = aborted.detail
+        body["aborted"] = {"line": first_unsent, "error": aborted.detail}
+        return JSONResponse(status_code=aborted.status_code, content=body)
+    return body
+
 # UPDATE
 @app.put("/students/{name}", tags=["UPDATE"])
-def update_student(name: str, student: UpdateStudent, request: Request):
+async def update_student(name: str, student: UpdateStudent, request: Request):
     updates = {k: v for k, v in student.dict().items() if v is not None}
     if not updates:
         raise HTTPException(status_code=400, detail="No fields to update")
 
-    result = db.update_one({"name": name}, updates)
+    updates["updated_at"] = datetime.utcnow()
+
+    result = await db.update_one({"name": name}, updates)
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Student not found or nothing updated")
 
     return {"message": f"Student '{name}' updated"}
 
 
+BULK_ACTIONS = {"update", "upsert", "delete"}
+
+def bulk_op_to_write(op: BulkOp, user):
+    """Translate one BulkOp into a bulk_update/bulk_delete op; raises ValueError if it is malformed."""
+    if op.action not in BULK_ACTIONS:
+        raise ValueError(f"Unknown action '{op.action}'")
+    if (op.id is None) == (op.name is None):
+        raise ValueError("Give exactly one of 'id' or 'name'")
+    if op.id is not None:
+        if not ObjectId.is_valid(op.id):
+            raise ValueError(f"Invalid ObjectId '{op.id}'")
+        query = {"_id": ObjectId(op.id)}
+    else:
+        query = {"name": op.name}
+
+    if op.action == "delete":
+        return bulk_delete(query)
+
+    if op.action == "upsert":
+        # An inserted student must be complete, so upserts carry a full
+        # Student and match by its name (an unknown id cannot name one)
+        if op.name is None:
+            raise ValueError("Upsert by 'name', not 'id'")
+        if op.student is None:
+            raise ValueError("Upsert needs the full 'student'")
+        if op.student.name != op.name:
+            raise ValueError("'student.name' must equal 'name'")
+        now = datetime.utcnow()
+        update = {
+            "$set": with_name_key({**op.student.dict(), "updated_at": now}),
+            "$setOnInsert": {"created_at": now, "created_by": user["sub"]},
+            "$inc": {"_v": 1},
+        }
+        return bulk_update(query, update, upsert=True)
+
+    updates = {k: v for k, v in (op.values.dict() if op.values else {}).items() if v is not None}
+    if not updates:
+        raise ValueError("No fields to update")
+    updates["updated_at"] = datetime.utcnow()
+    return bulk_update(query, {"$set": updates, "$inc": {"_v": 1}})
+
+
+@app.post("/students/bulk", tags=["UPDATE"])
+async def bulk_students(body: BulkRequest, request: Request):
+    """Mixed update/upsert/delete by id or name, run as chunked bulk writes.
+
+    Malformed ops are reported in `errors`. Unordered, they are skipped and
+    the rest still run; with `ordered=true` a malformed op stops the run like
+    a failed write does: only the ops before it are sent.
+    """
+    user = request.state.user
+    writes, positions, errors = [], [], []
+    for index, op in enumerate(body.ops):
+        try:
+            writes.append(bulk_op_to_write(op, user))
+            positions.append(index)
+        except ValueError as e:
+            errors.append({"index": index, "error": str(e)})
+            if body.ordered:
+                break
+
+    totals = await db.bulk_write(writes, ordered=body.ordered) if writes else new_bulk_totals()
+    # Map write positions back to the caller's op indexes
+    errors += [{"index": positions[e["index"]], "error": e["error"]} for e in totals["errors"]]
+    return {
+        "matched": totals["matched"],
+        "modified": totals["modified"],
+        "upserted": totals["upserted"],
+        "deleted": totals["deleted"],
+        "upserted_ids": {str(positions[i]): str(_id) for i, _id in totals["upserted_ids"].items()},
+        "errors": sorted(errors, key=lambda e: e["index"]),
+    }
+
 
 # DELETE
 @app.delete("/students/student_name/{name}", tags=["DELETE"])
-def delete_student_by_name(name: str, request: Request):
-    result = db.delete_one({"name": name})
+async def delete_student_by_name(name: str, request: Request):
+    result = await db.delete_one({"name": name})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Student not found")
     return {"message": f"Student '{name}' deleted"}
 
 
 @app.delete("/students/student_id/{id}", tags=["DELETE"])
-def delete_student_by_id(id: str, request: Request):
-    result = db.delete_one({"_id": ObjectId(id)})
+async def delete_student_by_id(id: str, request: Request):
+    result = await db.delete_one({"_id": ObjectId(id)})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Student not found")
     return {"message": f"Student '{id}' deleted"}
 
 
 @app.delete("/students/", tags=["DELETE"])
-def delete_all_students(request: Request):
-    result = db.delete_all()
+async def delete_all_students(request: Request):
+    result = await db.delete_all()
     return {"message": f"Deleted {result.deleted_count} students"}
 
 
 
 
+@app.get("/metrics", tags=["MONITORING"], response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/decode-token", tags=["AUTHENTICATION"])
-def decode_token(request: Request):
+async def decode_token(request: Request):
     return {
         "verified": True,
         "user_info": request.state.user
@@ -240,3 +756,9 @@ def decode_token(request: Request):
 
     
 
+
+if __name__ == "__main__":
+    # Multi-worker launcher; see serve.py for options (workers, reload, drain)
+    import sys
+    from serve import main
+    main(["mongo_api", *sys.argv[1:]])
@@ -0,0 +1,171 @@
+"""Opt-in per-request profiler writing collapsed stacks or speedscope files.
+
+Enable with PROFILE_SAMPLE_RATE (fraction of requests) and/or PROFILE_TOKEN
+(profile any request sending `X-Profile: <token>`). With both unset the
+middleware is not installed at all.
+
+Collapsed files load in flamegraph.pl / speedscope / inferno; speedscope
+files open directly at https://www.speedscope.app.
+"""
+import asyncio
+import contextvars
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import time
+from itertools import count
+import metrics
+
+# Profiling config (override with environment variables)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")  # shared admin secret for on-demand profiling
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "x-profile").lower().encode()
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_FORMAT = os.getenv("PROFILE_FORMAT", "collapsed")  # collapsed or speedscope
+
+AWAITING = "<awaiting>"  # time the request's task spent suspended (I/O, Motor threads, other tasks)
+
+_active = contextvars.ContextVar("profile", default=None)
+_labels = {}
+_sequence = count()
+
+
+def _label(code):
+    label = _labels.get(code)
+    if label is None:
+        label = _labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return label
+
+
+# --- PROFILER ---
+class RequestProfile:
+    """Deterministic profile of one request, aggregated by stack.
+
+    The profile hook is per thread, but it only records events whose context
+    carries this profile, so concurrent requests on the same event loop do
+    not leak into each other's stacks.
+    """
+
+    def __init__(self, root_code):
+        self.root_code = root_code
+        self.stacks = {}  # tuple of frame labels -> microseconds
+        self.stack = ("request",)
+        self.last = time.perf_counter()
+
+    def _stack(self, frame, leaf=None):
+        labels = [leaf] if leaf else []
+        while frame is not None:
+            if frame.f_code is self.root_code:
+                labels.append("request")
+                return tuple(reversed(labels))
+            labels.append(_label(frame.f_code))
+            frame = frame.f_back
+        return ("request", AWAITING)
+
+    def _charge(self):
+        self.stacks[self.stack] = self.stacks.get(self.stack, 0) + (time.perf_counter() - self.last) * 1e6
+
+    def event(self, frame, event, arg):
+        self._charge()
+        if event == "return":
+            self.stack = self._stack(frame.f_back)
+        elif event == "c_call":
+            self.stack = self._stack(frame, f"{getattr(arg, '__qualname__', arg)} (builtin)")
+        else:  # call, c_return, c_exception
+            self.stack = self._stack(frame)
+        self.last = time.perf_counter()  # keep the hook's own cost out of the next sample
+
+    def collapsed(self):
+        return "".join(
+            f"{';'.join(label.replace(';', ',') for label in stack)} {round(us)}\n"
+            for stack, us in self.stacks.items() if round(us)
+        )
+
+    def speedscope(self, name):
+        frames, index, samples, weights = [], {}, [], []
+        for stack, us in self.stacks.items():
+            sample = []
+            for label in stack:
+                if label not in index:
+                    index[label] = len(frames)
+                    frames.append({"name": label})
+                sample.append(index[label])
+            samples.append(sample)
+            weights.append(us)
+        return json.dumps({
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled", "name": name, "unit": "microseconds",
+                "startValue": 0, "endValue": sum(weights),
+                "samples": samples, "weights": weights,
+            }],
+        })
+
+
+def _hook(frame, event, arg):
+    profile = _active.get()
+    if profile is not None:
+        profile.event(frame, event, arg)
+
+
+def _write(method, route, profile):
+    # e.g. profiles/GET_students_id/, so GET and POST /students/ stay apart
+    name = f"{method} {route}"
+    directory = os.path.join(PROFILE_DIR, re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("_"))
+    os.makedirs(directory, exist_ok=True)
+    stem = f"{int(time.time() * 1000)}-{os.getpid()}-{next(_sequence)}"
+    if PROFILE_FORMAT == "speedscope":
+        path, body = os.path.join(directory, stem + ".speedscope.json"), profile.speedscope(name)
+    else:
+        path, body = os.path.join(directory, stem + ".collapsed"), profile.collapsed()
+    with open(path, "w") as f:
+        f.write(body)
+
+
+# --- MIDDLEWARE ---
+class ProfilingMiddleware:
+    """Pure ASGI middleware that profiles sampled or explicitly requested calls."""
+
+    def __init__(self, app, sample_rate=PROFILE_SAMPLE_RATE, token=PROFILE_TOKEN):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.token = token.encode()
+        self.running = 0
+
+    def _wanted(self, scope):
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER:
+                    return hmac.compare_digest(value, self.token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope):
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(ProfilingMiddleware.__call__.__code__)
+        token = _active.set(profile)
+        if self.running == 0:
+            sys.setprofile(_hook)
+        self.running += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _active.reset(token)
+            profile._charge()
+            self.running -= 1
+            if self.running == 0:
+                sys.setprofile(None)
+            route = metrics.route_template(scope["app"], scope)
+            await asyncio.get_running_loop().run_in_executor(None, _write, scope["method"], route, profile)
+
+
+def install(app):
+    """Add ProfilingMiddleware only when profiling is configured."""
+    if PROFILE_SAMPLE_RATE > 0 or PROFILE_TOKEN:
+        app.add_middleware(ProfilingMiddleware)
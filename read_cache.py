@@ -0,0 +1,188 @@
+"""Opt-in read cache for AsyncMongoCRUD (READ_CACHE_BACKEND=local or redis).
+
+Writes made through AsyncMongoCRUD invalidate what they touch, but only in
+the cache that sees them: the local backend only hears about writes from its
+own process, and neither backend hears about writes made outside the API
+(mongosh, imports, another service). Such writes stay invisible to cached
+reads for up to READ_CACHE_TTL seconds, which is why the cache is off unless
+enabled.
+"""
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from bson import json_util
+
+# Read cache config (override with environment variables)
+READ_CACHE_BACKEND = os.getenv("READ_CACHE_BACKEND", "off")  # off, local or redis
+READ_CACHE_URL = os.getenv("READ_CACHE_URL", "redis://localhost:6379/0")
+READ_CACHE_TTL = float(os.getenv("READ_CACHE_TTL", "30"))
+READ_CACHE_SIZE = int(os.getenv("READ_CACHE_SIZE", "10000"))
+
+
+# --- BACKENDS ---
+# A backend stores values with a TTL and keeps integer counters. A counter
+# expires COUNTER_TTL_FACTOR * ttl after it was last read or bumped: every
+# entry keyed on one of its values was written right after such a read and
+# has expired by then, so a counter that restarts from zero cannot bring an
+# older entry back.
+COUNTER_TTL_FACTOR = 2
+class LocalCacheBackend:
+    """In-process LRU with TTL. Cached documents are shared, not copied; treat them as read-only."""
+
+    def __init__(self, maxsize=READ_CACHE_SIZE, ttl=READ_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._counters = OrderedDict()  # name -> (value, expires_at), oldest first
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    async def set(self, key, value):
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _counter(self, name, step):
+        now = time.monotonic()
+        # Every touch uses the same lifetime, so expired counters sit at the front
+        while self._counters:
+            oldest, (_, expires_at) = next(iter(self._counters.items()))
+            if expires_at > now:
+                break
+            del self._counters[oldest]
+        entry = self._counters.get(name)
+        if entry is None and not step:
+            return 0
+        value = (entry[0] if entry else 0) + step
+        self._counters[name] = (value, now + COUNTER_TTL_FACTOR * self.ttl)
+        self._counters.move_to_end(name)
+        return value
+
+    async def counters(self, *names):
+        return [self._counter(name, 0) for name in names]
+
+    async def incr(self, name):
+        return self._counter(name, 1)
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """Shared cache for multi-worker deployments (`pip install redis`)."""
+
+    def __init__(self, url=READ_CACHE_URL, ttl=READ_CACHE_TTL):
+        import redis.asyncio as redis  # optional dependency
+        self.redis = redis.from_url(url)
+        self.ttl = ttl
+
+    async def get(self, key):
+        raw = await self.redis.get(key)
+        return json_util.loads(raw) if raw is not None else None
+
+    async def set(self, key, value):
+        await self.redis.set(key, json_util.dumps(value), px=int(self.ttl * 1000))
+
+    async def counters(self, *names):
+        ttl_ms = int(COUNTER_TTL_FACTOR * self.ttl * 1000)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.mget(names)
+            for name in names:
+                pipe.pexpire(name, ttl_ms)  # no-op for counters that do not exist
+            values, *_ = await pipe.execute()
+        return [int(v or 0) for v in values]
+
+    async def incr(self, name):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.incr(name)
+            pipe.pexpire(name, int(COUNTER_TTL_FACTOR * self.ttl * 1000))
+            value, _ = await pipe.execute()
+        return value
+
+    def size(self):
+        return None
+
+
+# --- READ-THROUGH CACHE ---
+def _digest(*parts):
+    return hashlib.sha1(json_util.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+class ReadCache:
+    """Read-through cache for MongoCRUD reads with generation-based invalidation.
+
+    - `gen:<coll>` is bumped by every write; query results embed it in their key.
+    - `ver:<coll>:<id>` is bumped when one document changes; single-document
+      entries embed it, so an update only drops that document's entries.
+    - `epoch:<coll>` is bumped by writes that may touch any document
+      (delete_all, bulk writes); every single-document entry embeds it.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def _load(self, key, loader):
+        value = await self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = await loader()
+        if value is not None and value != []:
+            await self.backend.set(key, value)
+        return value
+
+    async def document(self, coll, doc_id, projection, loader):
+        epoch, version = await self.backend.counters(f"epoch:{coll}", f"ver:{coll}:{doc_id}")
+        key = f"doc:{coll}:{epoch}:{doc_id}:{version}:{_digest(projection)}"
+        return await self._load(key, loader)
+
+    async def query(self, coll, kind, args, loader):
+        generation, = await self.backend.counters(f"gen:{coll}")
+        key = f"q:{coll}:{generation}:{kind}:{_digest(args)}"
+        return await self._load(key, loader)
+
+    async def invalidate_queries(self, coll):
+        self.invalidations += 1
+        await self.backend.incr(f"gen:{coll}")
+
+    async def invalidate_document(self, coll, doc_id):
+        await self.backend.incr(f"ver:{coll}:{doc_id}")
+        await self.invalidate_queries(coll)
+
+    async def invalidate_all(self, coll):
+        await self.backend.incr(f"epoch:{coll}")
+        await self.invalidate_queries(coll)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "size": self.backend.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def build_read_cache():
+    """ReadCache for the configured backend, or None when READ_CACHE_BACKEND=off."""
+    if READ_CACHE_BACKEND == "off":
+        return None
+    if READ_CACHE_BACKEND == "redis":
+        return ReadCache(RedisCacheBackend())
+    return ReadCache(LocalCacheBackend())
@@ -0,0 +1,103 @@
+# Production launcher for mongo_api.py and jwt.py.
+#
+#   pip install uvicorn uvloop httptools
+#   python serve.py mongo_api                  # one worker per CPU on :8000
+#   python serve.py jwt --workers 4 --port 8001
+#   python serve.py mongo_api --reload         # development: 1 worker, restarts on code changes
+#
+# Workers are separate processes under uvicorn's supervisor. Each one imports
+# the app itself and opens its own Mongo pool on first use (db_client keys
+# clients by pid) and its own hashing pool, so nothing is shared across
+# processes. uvloop and httptools are used when installed.
+#
+# Signals to the supervisor pid (uvicorn >= 0.30):
+#   SIGHUP           rolling restart: workers are replaced one at a time,
+#                    each finishing its in-flight requests first (deploys)
+#   SIGTTIN/SIGTTOU  add / remove one worker
+#   SIGTERM/SIGINT   stop accepting, drain in-flight requests for up to
+#                    --graceful-timeout seconds, run lifespan shutdown
+#                    (queued coalesced writes are flushed), then exit
+#
+# Caches are per worker too, and a write only invalidates the cache of the
+# worker that made it. With more than one worker READ_CACHE_BACKEND=local is
+# therefore replaced by READ_CACHE_BACKEND=off (set READ_CACHE_BACKEND=redis
+# to share one cache between workers), and unknown usernames are no longer
+# cached, so a user registered through one worker can log in through all.
+#
+# Pool sizes are per worker: MONGO_MAX_POOL_SIZE=100 with 8 workers allows
+# 800 connections to mongod. See benchmarks/bench_workers.py for how
+# throughput scales with --workers.
+
+import argparse
+import importlib.util
+import os
+
+APPS = {"mongo_api": "mongo_api:app", "jwt": "jwt:app"}
+
+
+def _available(module):
+    return importlib.util.find_spec(module) is not None
+
+
+def worker_count(requested, storage_backend, events_source):
+    workers = requested or int(os.getenv("WEB_CONCURRENCY", "0")) or os.cpu_count() or 1
+    if storage_backend == "memory" and workers > 1:
+        print("STORAGE_BACKEND=memory keeps all data in one process; starting 1 worker")
+        return 1
+    if workers > 1 and events_source != "changestream":
+        print("Note: /students/events only sees writes made by the same worker "
+              "unless EVENTS_SOURCE=changestream")
+    return workers
+
+
+def share_caches(workers, read_cache_backend):
+    # Set in the environment before uvicorn spawns the workers that import the app
+    if workers <= 1:
+        return
+    if read_cache_backend == "local":
+        print("READ_CACHE_BACKEND=local would serve stale reads across workers; "
+              "using READ_CACHE_BACKEND=off (set READ_CACHE_BACKEND=redis to share one cache)")
+        os.environ["READ_CACHE_BACKEND"] = "off"
+    os.environ["USER_CACHE_NEGATIVE"] = "0"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run mongo_api or jwt with multiple workers")
+    parser.add_argument("app", choices=sorted(APPS), help="which app to serve")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=0, help="default: WEB_CONCURRENCY or the CPU count")
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("GRACEFUL_TIMEOUT", "30")),
+                        help="seconds a stopping worker may spend finishing in-flight requests")
+    parser.add_argument("--reload", action="store_true", help="development mode (single worker)")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    from storage import STORAGE_BACKEND
+    from events import EVENTS_SOURCE
+    from read_cache import READ_CACHE_BACKEND
+
+    workers = 1 if args.reload else worker_count(args.workers, STORAGE_BACKEND, EVENTS_SOURCE)
+    share_caches(workers, READ_CACHE_BACKEND)
+    # Split the CPUs between workers' hashing pools instead of giving every
+    # worker one hashing process per CPU (inherited by the worker processes)
+    os.environ.setdefault("HASH_WORKERS", str(max(1, (os.cpu_count() or 1) // workers)))
+
+    loop = "uvloop" if _available("uvloop") else "asyncio"
+    http = "httptools" if _available("httptools") else "h11"
+    print(f"Serving {APPS[args.app]} on {args.host}:{args.port} with {workers} worker(s), loop={loop}, http={http}")
+    uvicorn.run(
+        APPS[args.app],
+        host=args.host,
+        port=args.port,
+        workers=None if args.reload else workers,
+        reload=args.reload,
+        loop=loop,
+        http=http,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        proxy_headers=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import os
+from main import AsyncMongoCRUD
+
+# Storage backend config: "mongo" (default) or "memory" for the embedded
+# engine in memory_store.py (edge deployments, tests, no mongod needed)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo")
+
+# Keep per-collection stats counters up to date on every write (mongo backend)
+STATS_COUNTERS = os.getenv("STATS_COUNTERS", "0") == "1"
+
+
+def build_crud(db_name, collection_name, cache=None, versioned=False, counters=False, coalesce=False, events=None):
+    """The CRUD object routes talk to, for the configured storage backend.
+
+    Both backends expose the AsyncMongoCRUD interface, so routes do not
+    need to know which one they got.
+    """
+    if STORAGE_BACKEND == "memory":
+        from memory_store import MemoryCRUD
+        return MemoryCRUD(db_name=db_name, collection_name=collection_name, versioned=versioned, events=events)
+    if STORAGE_BACKEND != "mongo":
+        raise ValueError(f"Unknown STORAGE_BACKEND '{STORAGE_BACKEND}'")
+    return AsyncMongoCRUD(
+        db_name=db_name, collection_name=collection_name, cache=cache, versioned=versioned,
+        counters=counters, coalesce=coalesce, events=events,
+    )
@@ -0,0 +1,200 @@
+import copy
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from pymongo.results import DeleteResult, UpdateResult
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_store import MemoryStore, apply_projection, run_pipeline  # noqa: E402
+
+# Route tests run the apps on the embedded engine; no mongod needed
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+TEST_USER = {"username": "tester", "email": "tester@example.com", "password": "s3cret-pass"}
+
+
+@pytest.fixture(scope="session")
+def api():
+    """TestClient for mongo_api, authenticated as TEST_USER."""
+    from fastapi.testclient import TestClient
+    import mongo_api
+
+    with TestClient(mongo_api.app) as client:
+        client.post("/register", json=TEST_USER)
+        token = client.post("/token", json=TEST_USER).json()["access_token"]
+        client.headers["Authorization"] = f"Bearer {token}"
+        yield client
+
+
+@pytest.fixture
+def students_api(api):
+    """`api` with an empty students collection."""
+    api.delete("/students/")
+    return api
+
+
+def student(name, **fields):
+    return {"name": name, "age": 20, "city": "Lahore", "email": f"{name.lower()}@example.com", **fields}
+
+
+# --- Motor fakes ---
+# AsyncMongoCRUD unit tests swap the Motor client for these fakes over the
+# in-memory engine; see the fake_client fixture.
+class FakeCursor:
+    def __init__(self, coll, query, projection=None):
+        self.coll, self.query, self.projection = coll, query, projection
+        self._sort, self._limit = None, 0
+
+    def sort(self, key, direction=1):
+        self._sort = key if isinstance(key, list) else [(key, direction)]
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    async def to_list(self, length=None):
+        docs = self.coll.find(self.query, sort=self._sort, limit=self._limit)
+        return [apply_projection(d, self.projection) for d in docs]
+
+
+class FakeResults:
+    """An aggregate() cursor over already computed documents."""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length=None):
+        return self.docs
+
+
+class FakeCollection:
+    """The subset of a Motor collection AsyncMongoCRUD uses, over a MemoryCollection.
+
+    Documents and $set updates carrying a truthy `fail` field are rejected
+    as write errors, and every bulk_write call is counted in `bulk_calls`.
+    """
+
+    def __init__(self):
+        self.coll = MemoryStore(path="").collection("test.students")
+        self.bulk_calls = 0
+
+    def find(self, query=None, projection=None, **kwargs):
+        return FakeCursor(self.coll, query or {}, projection)
+
+    async def find_one(self, query, projection=None):
+        doc = self.coll.find_one(query)
+        return apply_projection(doc, projection) if doc is not None else None
+
+    def aggregate(self, pipeline):
+        return FakeResults(run_pipeline(self.coll.find(), pipeline))
+
+    async def insert_one(self, doc):
+        return SimpleNamespace(inserted_id=self.coll.insert(doc))
+
+    async def insert_many(self, docs, ordered=True):
+        errors = []
+        inserted = 0
+        for index, doc in enumerate(docs):
+            doc.setdefault("_id", ObjectId())
+            if doc.get("fail"):
+                errors.append({"index": index, "code": 2, "errmsg": "rejected"})
+                if ordered:
+                    break
+                continue
+            self.coll.insert(doc)
+            inserted += 1
+        if errors:
+            raise BulkWriteError({"nInserted": inserted, "writeErrors": errors})
+        return SimpleNamespace(inserted_ids=[d["_id"] for d in docs])
+
+    async def update_one(self, query, update, upsert=False):
+        matched, modified, upserted_id = self.coll.update(query, update, upsert)
+        return UpdateResult({"n": matched, "nModified": modified, "upserted": upserted_id}, True)
+
+    async def find_one_and_update(self, query, update, projection=None, upsert=False, return_document=None):
+        before = self.coll.find_one(query)
+        self.coll.update(query, update, upsert)
+        return apply_projection(before, projection) if before is not None else None
+
+    async def find_one_and_delete(self, query, projection=None):
+        doc = self.coll.find_one(query)
+        if doc is not None:
+            self.coll.remove(doc["_id"])
+        return apply_projection(doc, projection) if doc is not None else None
+
+    async def delete_one(self, query):
+        doc = self.coll.find_one(query)
+        return DeleteResult({"n": int(doc is not None and self.coll.remove(doc["_id"]))}, True)
+
+    async def delete_many(self, query):
+        return DeleteResult({"n": sum(self.coll.remove(d["_id"]) for d in self.coll.find(query))}, True)
+
+    async def bulk_write(self, ops, ordered=False):
+        self.bulk_calls += 1
+        raw = {"nMatched": 0, "nModified": 0, "nRemoved": 0, "nUpserted": 0, "upserted": [], "writeErrors": []}
+        for index, (kind, query, update, upsert) in enumerate(ops):  # neutral ops, see fake_client
+            if update is not None and update.get("$set", {}).get("fail"):
+                raw["writeErrors"].append({"index": index, "code": 2, "errmsg": "rejected"})
+                if ordered:
+                    break
+                continue
+            if kind == "delete":
+                raw["nRemoved"] += (await self.delete_one(query)).deleted_count
+                continue
+            matched, modified, upserted_id = self.coll.update(query, update, upsert)
+            raw["nMatched"] += matched
+            raw["nModified"] += modified
+            if upserted_id is not None:
+                raw["nUpserted"] += 1
+                raw["upserted"].append({"index": index, "_id": upserted_id})
+        if raw["writeErrors"]:
+            raise BulkWriteError(raw)
+        return SimpleNamespace(bulk_api_result=raw)
+
+
+class FakeStats:
+    """collection_stats: find_one, dotted $inc with upsert, replace_one."""
+
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, query, projection=None):
+        doc = self.docs.get(query["_id"])
+        return copy.deepcopy(doc) if doc is not None else None
+
+    async def update_one(self, query, update, upsert=False):
+        doc = self.docs.setdefault(query["_id"], {"_id": query["_id"]})
+        for path, n in update["$inc"].items():
+            *parents, leaf = path.split(".")
+            target = doc
+            for part in parents:
+                target = target.setdefault(part, {})
+            target[leaf] = target.get(leaf, 0) + n
+
+    async def replace_one(self, query, doc, upsert=False):
+        self.docs[query["_id"]] = {**copy.deepcopy(doc), "_id": query["_id"]}
+
+
+class FakeClient:
+    """client[db][collection], with a single database."""
+
+    def __init__(self):
+        self.collections = {"students": FakeCollection(), "collection_stats": FakeStats()}
+
+    def __getitem__(self, name):
+        return self.collections
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    """A FakeClient; bulk ops reach it as backend-neutral tuples instead of pymongo requests."""
+    import main
+
+    monkeypatch.setattr(main, "pymongo_write", lambda op: op)
+    return FakeClient()
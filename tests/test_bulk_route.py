@@ -0,0 +1,55 @@
+from conftest import student
+
+
+def seed(api, *names):
+    ids = {}
+    for name in names:
+        ids[name] = api.post("/students/", json=student(name)).json()["id"]
+    return ids
+
+
+def by_name(api):
+    return {s["name"]: s for s in api.get("/students/").json()}
+
+
+def test_mixed_ops_report_counts_and_errors_by_op_index(students_api):
+    ids = seed(students_api, "Ann", "Bob", "Cy")
+    r = students_api.post("/students/bulk", json={"ops": [
+        {"action": "update", "id": ids["Ann"], "values": {"age": 30}},
+        {"action": "frobnicate", "name": "Bob"},
+        {"action": "delete", "name": "Cy"},
+        {"action": "upsert", "name": "Dee", "student": student("Dee", age=40)},
+        {"action": "update", "name": "Bob"},  # nothing to update
+        {"action": "delete", "id": "not-an-id"},
+    ]})
+    assert r.status_code == 200
+    data = r.json()
+    assert (data["matched"], data["modified"], data["upserted"], data["deleted"]) == (1, 1, 1, 1)
+    assert list(data["upserted_ids"]) == ["3"]
+    assert [e["index"] for e in data["errors"]] == [1, 4, 5]
+    students = by_name(students_api)
+    assert sorted(students) == ["Ann", "Bob", "Dee"]
+    assert (students["Ann"]["age"], students["Dee"]["age"]) == (30, 40)
+
+
+def test_ordered_runs_stop_at_the_first_malformed_op(students_api):
+    seed(students_api, "Ann", "Bob")
+    r = students_api.post("/students/bulk", json={"ordered": True, "ops": [
+        {"action": "delete", "name": "Ann"},
+        {"action": "upsert", "id": "0" * 24, "student": student("Zed")},  # upserts go by name
+        {"action": "delete", "name": "Bob"},
+    ]})
+    data = r.json()
+    assert data["deleted"] == 1
+    assert data["errors"] == [{"index": 1, "error": "Upsert by 'name', not 'id'"}]
+    assert sorted(by_name(students_api)) == ["Bob"]
+
+
+def test_upserts_need_a_matching_full_student(students_api):
+    r = students_api.post("/students/bulk", json={"ops": [
+        {"action": "upsert", "name": "Dee"},
+        {"action": "upsert", "name": "Dee", "student": student("Other")},
+    ]})
+    assert [e["error"] for e in r.json()["errors"]] == [
+        "Upsert needs the full 'student'", "'student.name' must equal 'name'",
+    ]
@@ -0,0 +1,43 @@
+from conftest import student
+
+
+def test_list_etag_revalidates_until_a_write(students_api):
+    students_api.post("/students/", json=student("Ann"))
+    first = students_api.get("/students/")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+
+    cached = students_api.get("/students/", headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.headers["ETag"] == etag
+    assert students_api.get("/students/", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+    # The tag covers the query string, so another page is a different resource
+    assert students_api.get("/students/?limit=5", headers={"If-None-Match": etag}).status_code == 200
+
+    students_api.post("/students/", json=student("Bob"))
+    fresh = students_api.get("/students/", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] != etag
+    assert [s["name"] for s in fresh.json()] == ["Ann", "Bob"]
+
+
+def test_document_etags_change_only_with_that_document(students_api):
+    ann = students_api.post("/students/", json=student("Ann")).json()["id"]
+    by_name = students_api.get("/students/name/Ann")
+    etag = by_name.headers["ETag"]
+    assert students_api.get(f"/students/id/{ann}").headers["ETag"] == etag
+    assert students_api.get("/students/name/Ann", headers={"If-None-Match": etag}).status_code == 304
+    assert students_api.get(f"/students/id/{ann}", headers={"If-None-Match": etag}).status_code == 304
+
+    students_api.post("/students/", json=student("Bob"))
+    assert students_api.get("/students/name/Ann", headers={"If-None-Match": etag}).status_code == 304
+
+    students_api.put("/students/Ann", json={"city": "Karachi"})
+    changed = students_api.get("/students/name/Ann", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()["city"] == "Karachi"
+
+
+def test_unknown_documents_still_404_with_a_tag(students_api):
+    r = students_api.get("/students/name/Ghost", headers={"If-None-Match": '"x-0"'})
+    assert r.status_code == 404
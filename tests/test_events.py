@@ -0,0 +1,105 @@
+import asyncio
+
+from events import EventBus, sse_stream
+from memory_store import MemoryCRUD, MemoryStore
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def queued(sub):
+    return [sub.queue.get_nowait() for _ in range(sub.queue.qsize())]
+
+
+def publish(bus, n):
+    for i in range(n):
+        bus.publish("insert", "students", [f"id{i}"])
+
+
+def test_live_subscribers_get_every_event():
+    async def main():
+        bus = EventBus(buffer=10, history=10)
+        sub = bus.subscribe()
+        publish(bus, 3)
+        return [e["seq"] for e in queued(sub)]
+
+    assert run(main()) == [1, 2, 3]
+
+
+def test_reconnect_replays_missed_events():
+    async def main():
+        bus = EventBus(buffer=10, history=10)
+        publish(bus, 5)
+        replayed = queued(bus.subscribe(f"{bus.boot}-2"))
+        caught_up = queued(bus.subscribe(f"{bus.boot}-5"))
+        return replayed, caught_up
+
+    replayed, caught_up = run(main())
+    assert [e["seq"] for e in replayed] == [3, 4, 5]
+    assert caught_up == []
+
+
+def test_unknown_or_stale_ids_get_a_reset():
+    async def main():
+        bus = EventBus(buffer=3, history=4)
+        publish(bus, 8)
+        ids = [
+            f"{bus.boot}-1",   # fell out of history
+            f"{bus.boot}-5",   # in history, but more than a buffer behind
+            f"{bus.boot}-99",  # ahead of this process
+            "deadbeef-7",      # another process or an earlier boot
+            "7",
+        ]
+        return bus, [queued(bus.subscribe(i)) for i in ids]
+
+    bus, results = run(main())
+    for events in results:
+        assert [(e["op"], e["id"]) for e in events] == [("reset", f"{bus.boot}-8")]
+
+
+def test_slow_consumer_is_dropped_with_a_notice():
+    async def main():
+        bus = EventBus(buffer=2, history=10)
+        sub = bus.subscribe()
+        publish(bus, 3)
+        return bus, sub, queued(sub)
+
+    bus, sub, events = run(main())
+    assert sub.dropped and events == [None]
+    assert sub not in bus.subscribers
+    assert bus.stats()["dropped_subscribers"] == 1
+
+
+def test_sse_stream_frames_events_and_ends_on_drop():
+    async def main():
+        bus = EventBus(buffer=2, history=10)
+        stream = sse_stream(bus, heartbeat=0.01)
+        chunks = [await stream.__anext__()]  # retry hint; the subscription now exists
+        publish(bus, 1)
+        chunks.append(await stream.__anext__())
+        chunks.append(await stream.__anext__())  # nothing new: keep-alive
+        publish(bus, 3)
+        chunks += [chunk async for chunk in stream]
+        return bus, chunks
+
+    bus, chunks = run(main())
+    assert chunks[0].startswith("retry:")
+    assert chunks[1].startswith(f"id: {bus.boot}-1\nevent: insert\n")
+    assert chunks[2] == ": keep-alive\n\n"
+    assert chunks[-1].startswith("event: dropped")
+    assert not bus.subscribers
+
+
+def test_writes_that_change_nothing_publish_nothing():
+    async def main():
+        bus = EventBus(buffer=10, history=10)
+        crud = MemoryCRUD("test", "students", store=MemoryStore(path=""), events=bus)
+        sub = bus.subscribe()
+        await crud.create_many([])
+        await crud.delete_one({"name": "nobody"})
+        await crud.delete_all()
+        await crud.create_one({"name": "Ann"})
+        return queued(sub)
+
+    assert [(e["op"], e["count"]) for e in run(main())] == [("insert", 1)]
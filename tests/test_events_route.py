@@ -0,0 +1,44 @@
+import pytest
+
+import events
+
+
+@pytest.fixture
+def token(api, monkeypatch):
+    # TestClient reads the whole body, so end each stream after its first chunk
+    sse_stream = events.sse_stream
+
+    async def first_chunk(bus, last_event_id=None):
+        stream = sse_stream(bus, last_event_id)
+        yield await stream.__anext__()
+        await stream.aclose()
+
+    monkeypatch.setattr(events, "sse_stream", first_chunk)
+    return api.headers["Authorization"].removeprefix("Bearer ")
+
+
+def get_events(api, url="/students/events"):
+    """Status and body of an event stream request made without the Authorization header."""
+    r = api.get(url, headers={"Authorization": ""})
+    return r.status_code, r.text if r.status_code == 200 else r.json()["detail"]
+
+
+def test_events_accept_the_token_as_a_query_parameter(api, token):
+    assert get_events(api, f"/students/events?access_token={token}") == (200, "retry: 3000\n\n")
+
+
+def test_events_accept_the_token_as_a_cookie(api, token):
+    api.cookies.set("access_token", token)
+    try:
+        assert get_events(api) == (200, "retry: 3000\n\n")
+    finally:
+        api.cookies.clear()
+
+
+def test_events_still_reject_missing_or_bad_tokens(api, token):
+    assert get_events(api) == (401, "Authorization token missing")
+    assert get_events(api, "/students/events?access_token=nope") == (401, "Invalid or expired token")
+
+
+def test_other_routes_ignore_the_query_token(api, token):
+    assert get_events(api, f"/students/?access_token={token}") == (401, "Authorization token missing")
@@ -0,0 +1,47 @@
+import gzip
+import json
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from conftest import student
+
+
+def rows(body):
+    return [json.loads(line) for line in body.splitlines()]
+
+
+def test_export_streams_one_json_object_per_line(students_api):
+    for name in ("Ann", "Bob", "Cy"):
+        students_api.post("/students/", json=student(name))
+    r = students_api.get("/students/export", params={"batch_size": 2})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    assert r.text.endswith("\n")
+    assert sorted(row["name"] for row in rows(r.text)) == ["Ann", "Bob", "Cy"]
+    assert set(rows(r.text)[0]) == {"id", "name", "email", "age", "city"}
+
+
+def test_gzip_export_is_one_valid_gzip_stream(students_api):
+    for name in ("Ann", "Bob", "Cy"):
+        students_api.post("/students/", json=student(name))
+    with students_api.stream("GET", "/students/export", params={"gzip": True, "batch_size": 1}) as r:
+        assert r.headers["content-encoding"] == "gzip"
+        raw = b"".join(r.iter_raw())
+    assert sorted(row["name"] for row in rows(gzip.decompress(raw).decode())) == ["Ann", "Bob", "Cy"]
+    member = zlib.decompressobj(wbits=31)
+    member.decompress(raw)
+    assert member.eof and member.unused_data == b""  # one gzip member, nothing after it
+
+
+def test_export_of_an_empty_collection_is_empty(students_api):
+    assert students_api.get("/students/export").content == b""
+    assert students_api.get("/students/export", params={"gzip": True}).content == b""  # decoded by the client
+
+
+def test_since_filters_compare_in_utc(students_api):
+    students_api.post("/students/", json=student("Ann"))
+    past = (datetime.now(timezone.utc) - timedelta(minutes=5)).isoformat()
+    future = (datetime.now(timezone(timedelta(hours=5))) + timedelta(minutes=5)).isoformat()
+    assert len(rows(students_api.get("/students/export", params={"created_since": past}).text)) == 1
+    assert rows(students_api.get("/students/export", params={"created_since": future}).text) == []
+    assert len(rows(students_api.get("/students/export", params={"updated_since": past}).text)) == 1
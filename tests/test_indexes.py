@@ -0,0 +1,38 @@
+import logging
+
+import pytest
+from pymongo.errors import OperationFailure
+
+from indexes import INDEXES, ensure_indexes
+
+
+class FakeCollection:
+    def __init__(self, name, fail_code=None):
+        self.name = name
+        self.fail_code = fail_code
+        self.created = []
+
+    def create_indexes(self, models):
+        if self.fail_code and any(m.document.get("unique") for m in models):
+            raise OperationFailure("E11000 duplicate key error", self.fail_code)
+        self.created += [m.document["name"] for m in models]
+
+    def aggregate(self, pipeline):
+        return [{"_id": {"username": "ann"}, "count": 2}]
+
+
+def fake_db(fail_code):
+    return {name: FakeCollection(name, fail_code if name == "users" else None) for name in INDEXES}
+
+
+def test_duplicates_skip_only_the_unique_index(caplog):
+    db = fake_db(11000)
+    with caplog.at_level(logging.ERROR, logger="indexes"):
+        assert ensure_indexes(db) == ["users.username_unique"]
+    assert "{'username': 'ann'} x2" in caplog.text
+    assert db["students"].created == [m.document["name"] for m in INDEXES["students"]]
+
+
+def test_other_index_failures_still_raise():
+    with pytest.raises(OperationFailure):
+        ensure_indexes(fake_db(13))
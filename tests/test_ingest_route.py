@@ -0,0 +1,38 @@
+import json
+
+import mongo_api
+from conftest import student
+
+
+def ndjson(*lines):
+    return "\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines)
+
+
+def test_every_line_gets_its_own_result(students_api):
+    body = ndjson(student("Ann"), "{not json", {"name": "NoAge"}, "", student("Bob"), student("Cy"))
+    r = students_api.post("/students/ingest", params={"chunk_size": 2, "concurrency": 1}, content=body)
+    assert r.status_code == 200
+    data = r.json()
+    assert (data["inserted"], data["failed"]) == (3, 2)
+    assert [(row["line"], "id" in row) for row in data["results"]] == [
+        (1, True), (2, False), (3, False), (5, True), (6, True),
+    ]
+    assert students_api.get("/students/").headers["X-Total-Count"] == "3"
+
+
+def test_an_oversized_line_stops_reading_but_reports_what_was_sent(students_api, monkeypatch):
+    monkeypatch.setattr(mongo_api, "INGEST_MAX_LINE", 200)
+    body = ndjson(*[student(f"S{i}") for i in range(4)], "x" * 500, student("Late"))
+    r = students_api.post("/students/ingest", params={"chunk_size": 3}, content=body)
+    assert r.status_code == 413
+    data = r.json()
+    assert data["detail"] == "Line 5 is longer than 200 bytes"
+    # The first chunk (lines 1-3) was sent; line 4 was still waiting for a chunk
+    assert [row["line"] for row in data["results"]] == [1, 2, 3]
+    assert data["aborted"]["line"] == 4
+    assert students_api.get("/students/").headers["X-Total-Count"] == "3"
+
+
+def test_a_line_without_a_trailing_newline_is_read(students_api):
+    r = students_api.post("/students/ingest", content=ndjson(student("Ann"), student("Bob")).encode())
+    assert r.json()["inserted"] == 2
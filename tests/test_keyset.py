@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from main import decode_cursor, encode_cursor, page_projection, page_query, split_page
+from memory_store import MemoryCRUD, MemoryStore
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_cursor_round_trips_the_sort_value_and_id():
+    doc = {"_id": ObjectId(), "age": 12}
+    token = encode_cursor(doc, "age", {"city": "Lahore"})
+    assert decode_cursor(token, "age", {"city": "Lahore"}) == (12, doc["_id"])
+
+
+@pytest.mark.parametrize("sort_key, query", [("name", {"city": "Lahore"}), ("age", {"city": "Karachi"}), ("age", None)])
+def test_cursor_is_bound_to_its_sort_and_filter(sort_key, query):
+    token = encode_cursor({"_id": ObjectId(), "age": 12}, "age", {"city": "Lahore"})
+    with pytest.raises(ValueError, match="different sort or filter"):
+        decode_cursor(token, sort_key, query)
+
+
+def test_garbage_cursor_is_rejected():
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor("not-a-cursor")
+
+
+def test_page_query_breaks_ties_on_id():
+    last = ObjectId()
+    token = encode_cursor({"_id": last, "age": 12}, "age", {"city": "Lahore"})
+    query, sort = page_query({"city": "Lahore"}, token, "age")
+    assert query == {"$and": [{"city": "Lahore"}, {"$or": [
+        {"age": {"$gt": 12}},
+        {"age": 12, "_id": {"$gt": last}},
+    ]}]}
+    assert sort == [("age", 1), ("_id", 1)]
+    assert page_query(None, encode_cursor({"_id": last}), "_id") == ({"_id": {"$gt": last}}, [("_id", 1)])
+
+
+@pytest.mark.parametrize("projection, expected", [
+    (None, None),
+    ({"name": 1}, {"name": 1, "age": 1}),
+    ({"name": 1, "age": 1}, {"name": 1, "age": 1}),
+    ({"name_key": 0, "age": 0}, {"name_key": 0}),  # exclusion: stop excluding the sort key
+    ({"_id": 0, "age": 0}, {"_id": 0}),
+])
+def test_projection_keeps_the_sort_key(projection, expected):
+    assert page_projection(projection, "age") == expected
+
+
+def test_split_page_only_hands_out_a_cursor_when_more_remain():
+    docs = [{"_id": ObjectId(), "age": n} for n in range(3)]
+    page, token = split_page(docs, 2, "age")
+    assert page == docs[:2] and decode_cursor(token, "age") == (1, docs[1]["_id"])
+    assert split_page(docs[:2], 2, "age") == (docs[:2], None)
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 5])
+def test_pages_over_duplicate_sort_values_skip_and_repeat_nothing(limit):
+    crud = MemoryCRUD("test", "students", store=MemoryStore(path=""))
+    run(crud.create_many([{"name": f"s{i}", "age": [10, 10, 10, 11, 11, 12, 10][i]} for i in range(7)]))
+    seen, after = [], None
+    while True:
+        page, after = run(crud.read_page(limit=limit, after=after, sort_key="age", projection={"name": 1}))
+        seen.extend((d["age"], d["name"]) for d in page)
+        if after is None:
+            break
+    assert seen == sorted(seen)
+    assert sorted(name for _, name in seen) == [f"s{i}" for i in range(7)]
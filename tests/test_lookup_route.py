@@ -0,0 +1,26 @@
+import mongo_api
+from conftest import student
+
+
+def test_results_follow_the_request_order_with_per_item_errors(students_api):
+    ann = students_api.post("/students/", json=student("Ann")).json()["id"]
+    students_api.post("/students/", json=student("Bob"))
+    r = students_api.post("/students/lookup", json={
+        "ids": ["nope", ann, "0" * 24],
+        "names": ["Bob", "Ghost", "Ann"],
+    })
+    assert r.status_code == 200
+    data = r.json()
+    assert data["missing"] == 3
+    assert [(row.get("id") or row.get("name"), row.get("error")) for row in data["results"]] == [
+        ("nope", "Invalid ObjectId"), (ann, None), ("0" * 24, "Student ID not found"),
+        ("Bob", None), ("Ghost", "Student not found"), ("Ann", None),
+    ]
+    assert data["results"][1]["student"]["name"] == "Ann"
+    assert data["results"][3]["student"]["email"] == "bob@example.com"
+
+
+def test_lookups_are_capped(students_api, monkeypatch):
+    monkeypatch.setattr(mongo_api, "LOOKUP_MAX_ITEMS", 2)
+    r = students_api.post("/students/lookup", json={"ids": ["a", "b"], "names": ["c"]})
+    assert r.status_code == 400
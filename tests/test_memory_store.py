@@ -0,0 +1,230 @@
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from main import prefix_query, bulk_update, bulk_delete
+from memory_store import MemoryCRUD, MemoryStore, _sort_key, matches
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def names(docs):
+    return sorted(d["name"] for d in docs)
+
+
+@pytest.fixture
+def db():
+    crud = MemoryCRUD("test", "students", store=MemoryStore(path=""), versioned=True)
+    run(crud.create_many([
+        {"name": "Alice", "age": 15, "city": "Lahore", "created_at": datetime(2021, 3, 1)},
+        {"name": "alan", "age": 12, "city": "Karachi", "created_at": datetime(2019, 6, 1)},
+        {"name": "Bob", "age": 17, "city": "Lahore", "created_at": datetime(2022, 1, 1)},
+        {"name": "bert", "age": 9, "created_at": datetime(2020, 1, 1)},
+        {"name": "Carl", "age": "twenty", "city": None, "created_at": datetime(2023, 5, 5)},
+    ]))
+    return crud
+
+
+# --- OPERATORS ---
+@pytest.mark.parametrize("query, expected", [
+    ({"age": {"$gt": 12}}, ["Alice", "Bob"]),
+    ({"age": {"$gte": 12, "$lt": 17}}, ["Alice", "alan"]),
+    ({"age": {"$lte": 9}}, ["bert"]),
+    ({"age": {"$ne": 15}}, ["Bob", "Carl", "alan", "bert"]),
+    ({"city": {"$in": ["Lahore", "Karachi"]}}, ["Alice", "Bob", "alan"]),
+    ({"city": {"$nin": ["Lahore"]}}, ["Carl", "alan", "bert"]),
+    ({"city": {"$exists": False}}, ["bert"]),
+    ({"city": None}, ["Carl", "bert"]),
+    ({"age": {"$type": "string"}}, ["Carl"]),
+    ({"name": {"$regex": "^a", "$options": "i"}}, ["Alice", "alan"]),
+    ({"$or": [{"age": {"$lt": 10}}, {"name": "Bob"}]}, ["Bob", "bert"]),
+    ({"$and": [{"city": "Lahore"}, {"age": {"$gt": 15}}]}, ["Bob"]),
+    (prefix_query("AL"), ["Alice", "alan"]),
+])
+def test_query_operators(db, query, expected):
+    assert names(run(db.read_many(query))) == expected
+
+
+@pytest.mark.parametrize("projection, fields", [
+    ({"_id": 1}, ["_id"]),
+    ({"_id": 1, "age": 0}, ["_id"]),
+    ({"name": 1}, ["_id", "name"]),
+    ({"_id": 0, "name": 1}, ["name"]),
+    ({"_id": 0}, ["age", "city", "created_at", "name", "name_key"]),
+    ({"name_key": 0, "city": 0}, ["_id", "age", "created_at", "name"]),
+])
+def test_projections_follow_mongo(db, projection, fields):
+    assert sorted(run(db.read_one({"name": "Alice"}, projection))) == fields
+
+
+def test_aware_datetimes_compare_as_utc(db):
+    since = datetime(2021, 1, 1, tzinfo=timezone.utc)
+    assert names(run(db.read_many({"created_at": {"$gte": since}}))) == ["Alice", "Bob", "Carl"]
+    plus3 = timezone(timedelta(hours=3))
+    assert names(run(db.read_many({"created_at": datetime(2022, 1, 1, 3, tzinfo=plus3)}))) == ["Bob"]
+
+
+# --- INDEXES ---
+def test_index_lookup_matches_full_scan():
+    rng = random.Random(7)
+    crud = MemoryCRUD("test", "students", store=MemoryStore(path=""))
+    run(crud.create_many([
+        {"name": rng.choice(["Ann", "ann", "Ben", "Cy"]) + str(i),
+         "age": rng.choice([rng.randint(5, 30), float(rng.randint(5, 30)), "x", None]),
+         "created_at": datetime(2020, 1, 1) + timedelta(days=rng.randint(0, 1000))}
+        for i in range(300)
+    ]))
+    collection = crud.collection
+    queries = [
+        {"age": 18}, {"age": {"$gt": 18}}, {"age": {"$gte": 10, "$lte": 20}}, {"age": {"$lt": 7.5}},
+        {"age": {"$gt": "a"}}, {"age": {"$eq": None}}, {"age": {"$gt": 10}, "name": {"$regex": "^A"}},
+        {"created_at": {"$gte": datetime(2021, 1, 1), "$lt": datetime(2021, 7, 1)}},
+        {"name": "Ann3"}, prefix_query("an"), {"$and": [{"age": {"$gte": 20}}, {"age": {"$lt": 25}}]},
+    ]
+    everything = collection.find()
+    for query in queries:
+        assert collection._candidates(query) is not None, query
+        scanned = [d["_id"] for d in everything if matches(d, query)]
+        assert [d["_id"] for d in collection.find(query)] == scanned, query
+
+
+# --- KEYSET PAGES ---
+@pytest.mark.parametrize("sort_key", ["_id", "name_key", "created_at"])
+def test_keyset_pages_cover_everything_once(db, sort_key):
+    seen, after = [], None
+    while True:
+        page, after = run(db.read_page(limit=2, after=after, sort_key=sort_key, projection={"name": 1}))
+        seen.extend(d["name"] for d in page)
+        if after is None:
+            break
+    assert sorted(seen) == names(run(db.read_all()))
+    assert len(seen) == len(set(seen))
+
+
+def test_id_pages_decode_only_what_they_return(db, monkeypatch):
+    collection = db.collection
+    for _ in range(3):  # a delete and re-insert must keep the _id index in step
+        run(db.delete_one({"name": "Bob"}))
+        run(db.create_one({"name": "Bob", "age": 17}))
+    decoded = []
+    get = collection.get
+    monkeypatch.setattr(collection, "get", lambda _id: decoded.append(_id) or get(_id))
+    page, after = run(db.read_page(limit=2))
+    assert len(decoded) == 3  # the page and the limit + 1 probe, of 5 documents
+    decoded.clear()
+    rest, _ = run(db.read_page(limit=10, after=after))
+    assert len(decoded) == len(rest) == 3
+    assert [d["_id"] for d in page + rest] == sorted(d["_id"] for d in run(db.read_all()))
+
+
+@pytest.mark.parametrize("sort_key", ["age", "name", "created_at"])
+def test_sorted_pages_walk_the_index(sort_key, monkeypatch):
+    # Keyset ranges stay inside one type bracket, like Mongo's, so every value is of one type
+    db = MemoryCRUD("test", "students", store=MemoryStore(path=""))
+    run(db.create_many([
+        {"name": f"s{i % 4}", "age": i % 3, "created_at": datetime(2020, 1, 1 + i % 5)} for i in range(9)
+    ]))
+    everything = run(db.read_all())
+    expected = [d["_id"] for d in sorted(everything, key=lambda d: (_sort_key(d.get(sort_key)), d["_id"]))]
+    collection = db.collection
+    decoded = []
+    get = collection.get
+    monkeypatch.setattr(collection, "get", lambda _id: decoded.append(_id) or get(_id))
+    seen, after = [], None
+    while True:
+        decoded.clear()
+        page, after = run(db.read_page(limit=2, after=after, sort_key=sort_key))
+        assert len(decoded) <= 3  # the page and the limit + 1 probe
+        seen.extend(d["_id"] for d in page)
+        if after is None:
+            break
+    assert seen == expected
+
+
+def test_keyset_page_on_filtered_query(db):
+    page, after = run(db.read_page(prefix_query("a"), limit=1, sort_key="name_key"))
+    assert [d["name"] for d in page] == ["alan"]
+    page, after = run(db.read_page(prefix_query("a"), limit=1, after=after, sort_key="name_key"))
+    assert [d["name"] for d in page] == ["Alice"] and after is None
+
+
+# --- PERSISTENCE ---
+def open_crud(path):
+    store = MemoryStore(path=str(path), snapshot_every=3)
+    return store, MemoryCRUD("test", "students", store=store, versioned=True)
+
+
+def test_recovers_snapshot_and_log_after_crash(tmp_path):
+    store, crud = open_crud(tmp_path / "db")
+    run(crud.create_many([{"name": f"s{i}", "age": i} for i in range(5)]))
+    run(crud.update_one({"name": "s1"}, {"age": 40}))
+    run(crud.delete_one({"name": "s2"}))
+    version = run(crud.collection_version())
+    store._log.close()  # crash: no final snapshot
+
+    store, crud = open_crud(tmp_path / "db")
+    assert names(run(crud.read_all())) == ["s0", "s1", "s3", "s4"]
+    assert names(run(crud.read_many({"age": {"$gte": 30}}))) == ["s1"]  # sorted index rebuilt
+    assert run(crud.collection_version()) == version
+    store.close()
+
+    store, crud = open_crud(tmp_path / "db")
+    assert run(crud.count()) == 4
+    assert run(crud.collection_version()) == version
+
+
+@pytest.mark.parametrize("torn", [b'{"c": "test.students", "op": "put", "doc": {"na', b"\x00\x00\x00\n"])
+def test_a_torn_last_log_entry_is_dropped(tmp_path, torn):
+    store, crud = open_crud(tmp_path / "db")
+    run(crud.create_many([{"name": "s0"}, {"name": "s1"}]))
+    store._log.close()
+    with open(tmp_path / "db.log", "ab") as f:
+        f.write(torn)  # crash mid-append
+
+    store, crud = open_crud(tmp_path / "db")
+    assert names(run(crud.read_all())) == ["s0", "s1"]
+    run(crud.create_one({"name": "s2"}))
+    store._log.close()
+
+    store, crud = open_crud(tmp_path / "db")
+    assert names(run(crud.read_all())) == ["s0", "s1", "s2"]
+
+
+def test_delete_all_is_replayed(tmp_path):
+    store, crud = open_crud(tmp_path / "db")
+    run(crud.create_many([{"name": f"s{i}", "age": i} for i in range(4)]))
+    run(crud.delete_all())
+    run(crud.create_one({"name": "after", "age": 1}))
+    store._log.close()
+
+    store, crud = open_crud(tmp_path / "db")
+    assert names(run(crud.read_all())) == ["after"]
+
+
+# --- BULK WRITES ---
+def test_bulk_write_runs_neutral_ops(db):
+    ops = [
+        bulk_update({"name": "Bob"}, {"$set": {"age": 18}}),
+        bulk_update({"name": "Zed"}, {"$set": {"name": "Zed", "age": 1}, "$setOnInsert": {"city": "Quetta"}}, upsert=True),
+        bulk_delete({"name": "bert"}),
+        bulk_delete({"name": "nobody"}),
+    ]
+    totals = run(db.bulk_write(ops))
+    assert (totals["matched"], totals["modified"], totals["upserted"], totals["deleted"]) == (1, 1, 1, 1)
+    assert list(totals["upserted_ids"]) == [1]
+    assert run(db.read_one({"name": "Zed"}))["city"] == "Quetta"
+    assert names(run(db.read_all())) == ["Alice", "Bob", "Carl", "Zed", "alan"]
+
+
+def test_cursor_is_rejected_for_another_sort_or_filter(db):
+    _, after = run(db.read_page(limit=1, sort_key="_id"))
+    with pytest.raises(ValueError):
+        run(db.read_page(limit=1, after=after, sort_key="name_key"))
+    with pytest.raises(ValueError):
+        run(db.read_page(prefix_query("a"), limit=1, after=after))
+    with pytest.raises(ValueError):
+        run(db.read_page(limit=1, after="not-a-cursor"))
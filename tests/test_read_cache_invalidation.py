@@ -0,0 +1,97 @@
+"""Every AsyncMongoCRUD write path must invalidate what the read cache holds.
+
+The Motor client is replaced by the conftest fakes, so the tests see exactly
+what a cached read would serve after each write.
+"""
+import asyncio
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from main import AsyncMongoCRUD, bulk_delete, bulk_update
+from read_cache import LocalCacheBackend, ReadCache
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture(params=[False, True], ids=["direct", "coalesced"])
+def crud(request, fake_client):
+    return AsyncMongoCRUD("test", "students", client=fake_client, cache=ReadCache(LocalCacheBackend()),
+                          coalesce=request.param)
+
+
+def seed(crud):
+    ann = {"_id": ObjectId(), "name": "Ann", "age": 10}
+    bob = {"_id": ObjectId(), "name": "Bob", "age": 11}
+    for doc in (ann, bob):
+        crud.collection.coll.insert(doc)
+    return ann["_id"]
+
+
+async def reads(crud, ann_id):
+    everyone = sorted((d["name"], d.get("age")) for d in await crud.read_all())
+    return everyone, await crud.read_one({"_id": ann_id})
+
+
+async def create_many_partly(crud):
+    with pytest.raises(BulkWriteError):
+        await crud.create_many([{"name": "Cy"}, {"name": "Dee", "fail": True}, {"name": "Eve"}])
+
+
+WRITES = {
+    "create_one": lambda crud: crud.create_one({"name": "Cy"}),
+    "create_many": lambda crud: crud.create_many([{"name": "Cy"}, {"name": "Dee"}]),
+    "create_many_failed": create_many_partly,
+    "create_many_unordered": lambda crud: crud.create_many_unordered([{"name": "Cy"}, {"name": "X", "fail": True}]),
+    "update_one": lambda crud: crud.update_one({"name": "Ann"}, {"age": 30}),
+    "delete_one": lambda crud: crud.delete_one({"name": "Ann"}),
+    "delete_all": lambda crud: crud.delete_all(),
+    "bulk_write": lambda crud: crud.bulk_write([
+        bulk_update({"name": "Ann"}, {"$set": {"age": 31}}), bulk_delete({"name": "Bob"}),
+    ]),
+}
+
+
+@pytest.mark.parametrize("write", list(WRITES))
+def test_cached_reads_see_every_write(crud, write):
+    async def scenario():
+        ann_id = seed(crud)
+        stale = await reads(crud, ann_id)
+        assert await reads(crud, ann_id) == stale
+        assert crud.cache.hits == 2  # both reads are now served from the cache
+
+        await WRITES[write](crud)
+        await crud.drain()
+
+        fresh = AsyncMongoCRUD("test", "students", client=crud.client)  # uncached view of the same data
+        return await reads(crud, ann_id), await reads(fresh, ann_id)
+
+    cached, truth = run(scenario())
+    assert cached == truth
+
+
+def test_document_counters_expire_but_outlive_their_entries():
+    async def scenario():
+        backend = LocalCacheBackend(ttl=0.05)
+        cache = ReadCache(backend)
+        versions = iter(["v1", "v2"])
+
+        async def loader():
+            return {"name": next(versions)}
+
+        await cache.invalidate_document("students", "ann")
+        first = await cache.document("students", "ann", None, loader)
+        await asyncio.sleep(0.06)  # the entry has expired, the counter has not
+        assert len(backend._counters) == 2
+        await asyncio.sleep(0.11)
+        await backend.counters("gen:other")  # any touch prunes expired counters
+        leftover = dict(backend._counters)
+        await cache.invalidate_document("students", "ann")
+        return first, await cache.document("students", "ann", None, loader), leftover
+
+    first, second, leftover = run(scenario())
+    assert leftover == {}
+    assert (first, second) == ({"name": "v1"}, {"name": "v2"})
@@ -0,0 +1,94 @@
+"""The counters document must agree with a fresh $facet recount after writes.
+
+The Motor client is replaced by the conftest fakes over the in-memory engine, so
+stats() and stats(fresh=True) read the same documents.
+"""
+import asyncio
+
+import pytest
+
+from main import AsyncMongoCRUD, age_bucket, bulk_delete, bulk_update, counter_key, counter_value
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def crud(fake_client):
+    crud = AsyncMongoCRUD("test", "students", client=fake_client, counters=True)
+    run(crud.ensure_counters())
+    return crud
+
+
+def seed(crud, n):
+    return run(crud.create_many([{"name": f"s{i}", "age": 10 + i % 5, "city": f"c{i % 3}"} for i in range(n)]))
+
+
+@pytest.mark.parametrize("ordered", [False, True])
+def test_bulk_writes_stay_chunked_and_keep_counters_exact(crud, ordered):
+    seed(crud, 6)
+    ops = [
+        bulk_update({"name": "s0"}, {"$set": {"city": "Lahore"}}),
+        bulk_update({"name": "s0"}, {"$set": {"name": "s1"}}),
+        bulk_delete({"name": "s1"}),  # the first s1 in order is the renamed s0
+        bulk_update({"name": "new"}, {"$set": {"name": "new", "age": 20, "city": "Lahore"}}, upsert=True),
+        bulk_update({"name": "new"}, {"$set": {"age": 40}}),
+        bulk_update({"name": "s3"}, {"$set": {"city": "X", "fail": True}}),
+        bulk_update({"name": "missing"}, {"$set": {"city": "X"}}),
+        bulk_delete({"name": "s4"}),
+    ]
+    totals = run(crud.bulk_write(ops, ordered=ordered, chunk_size=3))
+
+    assert crud.collection.bulk_calls == (2 if ordered else 3)  # ordered stops in the chunk holding op 5
+    assert [e["index"] for e in totals["errors"]] == [5]
+    assert totals["upserted_ids"].keys() == {3}
+    assert run(crud.stats()) == run(crud.stats(fresh=True))
+
+
+@pytest.mark.parametrize("value", ["Lahore", "St. Louis", "$where", "100%", "%2E", "a.b$c%", "", None])
+def test_counter_keys_are_field_safe_and_round_trip(value):
+    key = counter_key(value)
+    assert key and "." not in key and not key.startswith("$")
+    assert counter_value(key) == value
+
+
+@pytest.mark.parametrize("age, bucket", [(0, 0), (12.5, 0), (13, 13), (64, 50), (149, 65), (150, "other"),
+                                         (-1, "other"), (True, "other"), ("12", "other"), (None, "other")])
+def test_age_buckets_match_the_bucket_stage(age, bucket):
+    assert age_bucket(age) == bucket
+
+
+def test_counters_match_a_fresh_recount_after_writes(crud):
+    run(crud.create_one({"name": "a", "age": 12, "city": "St. Louis", "created_by": "ann"}))
+    run(crud.create_many([
+        {"name": "b", "age": 30, "city": "$where", "created_by": None},
+        {"name": "c", "age": "old", "city": "100%"},
+        {"name": "d", "age": 70, "created_by": "ann"},
+    ]))
+    run(crud.update_one({"name": "c"}, {"city": "a.b", "age": 19}))
+    run(crud.update_one({"name": "d"}, {"city": None}))
+    run(crud.delete_one({"name": "a"}))
+    run(crud.create_one({"name": "e", "age": 40, "city": "a.b", "created_by": None}))
+
+    stats = run(crud.stats())
+    assert stats == run(crud.stats(fresh=True))
+    assert stats["total"] == 4
+    assert {row["city"]: row["count"] for row in stats["by_city"]} == {"a.b": 2, "$where": 1, None: 1}
+    assert {row["created_by"]: row["count"] for row in stats["by_creator"]} == {None: 3, "ann": 1}
+
+
+def test_delete_all_keeps_inserts_that_land_during_it(crud):
+    seed(crud, 4)
+    delete_many = crud.collection.delete_many
+
+    async def delete_then_insert(query):
+        result = await delete_many(query)
+        await crud.create_one({"name": "late", "age": 20, "city": "c9"})  # lands before the counters reset
+        return result
+
+    crud.collection.delete_many = delete_then_insert
+    run(crud.delete_all())
+    stats = run(crud.stats())
+    assert stats == run(crud.stats(fresh=True))
+    assert stats["total"] == 1
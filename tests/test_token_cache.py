@@ -0,0 +1,50 @@
+import auth_utils
+from auth_utils import VerifiedTokenCache
+
+
+class Decoder:
+    def __init__(self, exp):
+        self.exp = exp
+        self.calls = 0
+
+    def __call__(self, token):
+        self.calls += 1
+        return None if token == "forged" else {"sub": token, "exp": self.exp}
+
+
+def test_payload_is_cached_until_exp(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(auth_utils.time, "time", lambda: now[0])
+    decode = Decoder(exp=1060)
+    cache = VerifiedTokenCache(decode)
+
+    assert cache.get("ann") == {"sub": "ann", "exp": 1060}
+    now[0] = 1059.9
+    cache.get("ann")
+    assert decode.calls == 1
+
+    now[0] = 1060
+    cache.get("ann")  # expired entry is dropped and the token decoded again
+    assert decode.calls == 2
+    assert cache.stats()["hits"] == 1
+
+
+def test_rejected_tokens_are_not_cached():
+    decode = Decoder(exp=2 ** 40)
+    cache = VerifiedTokenCache(decode)
+    assert cache.get("forged") is None
+    assert cache.get("forged") is None
+    assert decode.calls == 2 and cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    decode = Decoder(exp=2 ** 40)
+    cache = VerifiedTokenCache(decode, maxsize=2)
+    cache.get("a")
+    cache.get("b")
+    cache.get("a")
+    cache.get("c")  # evicts b
+    calls = decode.calls
+    cache.get("a")
+    cache.get("b")
+    assert decode.calls == calls + 1
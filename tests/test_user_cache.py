@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from user_cache import UserCache
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class Loader:
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, username):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return None if username == "ghost" else {"username": username}
+
+
+def test_concurrent_misses_share_one_load():
+    async def main():
+        cache, load = UserCache(), Loader()
+        users = await asyncio.gather(*[cache.get("ann", load) for _ in range(5)])
+        return cache, load, users
+
+    cache, load, users = run(main())
+    assert load.calls == 1
+    assert users == [{"username": "ann"}] * 5
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_entries_expire_after_the_ttl():
+    async def main():
+        cache, load = UserCache(ttl=0.05), Loader(delay=0)
+        await cache.get("ann", load)
+        await cache.get("ann", load)
+        first = load.calls
+        await asyncio.sleep(0.06)
+        await cache.get("ann", load)
+        return first, load.calls
+
+    assert run(main()) == (1, 2)
+
+
+def test_unknown_users_are_cached_only_when_negative():
+    async def main(negative):
+        cache, load = UserCache(negative=negative), Loader(delay=0)
+        await cache.get("ghost", load)
+        await cache.get("ghost", load)
+        return load.calls
+
+    assert run(main(True)) == 1
+    assert run(main(False)) == 2
+
+
+def test_waiters_reload_when_the_leader_is_cancelled():
+    async def main():
+        cache, load = UserCache(), Loader()
+        leader = asyncio.create_task(cache.get("ann", load))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(cache.get("ann", load)) for _ in range(3)]
+        await asyncio.sleep(0.005)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return load, await asyncio.gather(*waiters)
+
+    load, users = run(main())
+    assert users == [{"username": "ann"}] * 3
+    assert load.calls == 2  # the cancelled load and one retry shared by the waiters
+
+
+def test_loader_errors_reach_every_waiter_and_are_not_cached():
+    async def main():
+        calls = 0
+
+        async def failing(username):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            raise RuntimeError("db down")
+
+        cache = UserCache()
+        results = await asyncio.gather(*[cache.get("ann", failing) for _ in range(3)], return_exceptions=True)
+        await asyncio.gather(cache.get("ann", failing), return_exceptions=True)
+        return calls, results
+
+    calls, results = run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert calls == 2
@@ -0,0 +1,96 @@
+import asyncio
+
+from write_coalescer import WriteCoalescer
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class Flusher:
+    """flush() that records batches; a document "bad" fails on its own."""
+
+    def __init__(self):
+        self.batches = []
+        self.release = None
+
+    async def __call__(self, documents):
+        self.batches.append(list(documents))
+        if self.release is not None:
+            await self.release.wait()
+        return [ValueError(f"bad {d['n']}") if d.get("bad") else d["n"] for d in documents]
+
+
+def test_each_caller_gets_its_own_id_or_error():
+    async def main():
+        flush = Flusher()
+        coalescer = WriteCoalescer(flush, max_docs=10, max_wait_ms=20)
+        results = await asyncio.gather(
+            *[coalescer.submit({"n": n, "bad": n == 1}) for n in range(3)], return_exceptions=True)
+        await coalescer.drain()
+        return flush, coalescer, results
+
+    flush, coalescer, results = run(main())
+    assert results[0] == 0 and results[2] == 2
+    assert isinstance(results[1], ValueError) and str(results[1]) == "bad 1"
+    assert flush.batches == [[{"n": 0, "bad": False}, {"n": 1, "bad": True}, {"n": 2, "bad": False}]]
+    assert coalescer.stats()["batches"] == 1
+
+
+def test_batches_are_capped_at_max_docs():
+    async def main():
+        flush = Flusher()
+        coalescer = WriteCoalescer(flush, max_docs=4, max_wait_ms=20)
+        assert await asyncio.gather(*[coalescer.submit({"n": n}) for n in range(10)]) == list(range(10))
+        await coalescer.drain()
+        return flush
+
+    flush = run(main())
+    assert [len(b) for b in flush.batches] == [4, 4, 2]
+
+
+def test_a_failed_flush_fails_every_caller_in_the_batch():
+    async def boom(documents):
+        raise RuntimeError("down")
+
+    async def main():
+        coalescer = WriteCoalescer(boom, max_docs=10, max_wait_ms=5)
+        results = await asyncio.gather(*[coalescer.submit({"n": n}) for n in range(3)], return_exceptions=True)
+        await coalescer.drain()
+        return coalescer, results
+
+    coalescer, results = run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert coalescer.stats()["failed_batches"] == 1
+
+
+def test_submit_waits_when_the_queue_is_full():
+    async def main():
+        flush = Flusher()
+        flush.release = asyncio.Event()
+        coalescer = WriteCoalescer(flush, max_docs=1, max_wait_ms=0, max_queue=2)
+        tasks = [asyncio.create_task(coalescer.submit({"n": n})) for n in range(5)]
+        await asyncio.sleep(0.05)
+        # One document is being flushed, two are queued, two callers are held back
+        assert len(flush.batches) == 1
+        assert coalescer.stats()["queued"] == 2
+        assert sum(t.done() for t in tasks) == 0
+        flush.release.set()
+        assert await asyncio.gather(*tasks) == list(range(5))
+        await coalescer.drain()
+
+    run(main())
+
+
+def test_drain_flushes_everything_queued():
+    async def main():
+        flush = Flusher()
+        coalescer = WriteCoalescer(flush, max_docs=100, max_wait_ms=50)
+        tasks = [asyncio.create_task(coalescer.submit({"n": n})) for n in range(3)]
+        await asyncio.sleep(0)
+        await coalescer.drain()
+        assert all(t.done() for t in tasks)
+        assert coalescer._task is None
+        return [t.result() for t in tasks]
+
+    assert run(main()) == [0, 1, 2]
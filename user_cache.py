@@ -0,0 +1,95 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+# User cache config (override with environment variables)
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+# Cache "no such user" too; serve.py turns this off with several workers,
+# where a user registered through another worker would stay unknown here
+USER_CACHE_NEGATIVE = os.getenv("USER_CACHE_NEGATIVE", "1") == "1"
+# When set, get_current_user builds the user from the verified token claims
+# and skips the database entirely
+TRUST_TOKEN_CLAIMS = os.getenv("TRUST_TOKEN_CLAIMS", "0") == "1"
+
+
+class UserCache:
+    """Short-TTL, size-bounded cache of user records keyed by username.
+
+    Concurrent misses for the same username share one in-flight load, so a
+    burst of requests for a cold user costs a single query.
+    """
+
+    def __init__(self, ttl=USER_CACHE_TTL, maxsize=USER_CACHE_SIZE, negative=USER_CACHE_NEGATIVE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.negative = negative
+        self._entries = OrderedDict()  # username -> (user, expires_at)
+        self._inflight = {}            # username -> Future
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get(self, username, loader):
+        """Return the cached user, or await `loader(username)` and cache its result."""
+        entry = self._entries.get(username)
+        if entry is not None:
+            if entry[1] > time.monotonic():
+                self._entries.move_to_end(username)
+                self.hits += 1
+                return entry[0]
+            del self._entries[username]
+
+        pending = self._inflight.get(username)
+        if pending is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise  # this request was cancelled
+                # The leading request was cancelled, not this one: load again
+                # (the first waiter to get here leads the retry)
+                return await self.get(username, loader)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[username] = future
+        try:
+            user = await loader(username)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            self._inflight.pop(username, None)
+
+        # Unknown users are cached too; register() invalidates the entry
+        if user is not None or self.negative:
+            self._entries[username] = (user, time.monotonic() + self.ttl)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        future.set_result(user)
+        return user
+
+    def invalidate(self, username):
+        self._entries.pop(username, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,117 @@
+import asyncio
+import os
+import time
+import metrics
+
+# Write coalescer config (override with environment variables)
+WRITE_COALESCE = os.getenv("WRITE_COALESCE", "0") == "1"
+WRITE_COALESCE_MAX_DOCS = int(os.getenv("WRITE_COALESCE_MAX_DOCS", "100"))
+WRITE_COALESCE_MAX_WAIT_MS = float(os.getenv("WRITE_COALESCE_MAX_WAIT_MS", "2"))
+WRITE_COALESCE_QUEUE = int(os.getenv("WRITE_COALESCE_QUEUE", "10000"))
+
+batch_sizes = metrics.Histogram(
+    "write_coalescer_batch_size", "Documents per coalesced insert_many",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+flush_latency = metrics.Histogram("write_coalescer_flush_seconds", "Duration of one coalesced insert_many")
+
+
+class WriteCoalescer:
+    """Group commit for single-document inserts.
+
+    Concurrent `submit` calls are gathered for up to `max_wait_ms` or
+    `max_docs` documents and handed to `flush(docs)` as one batch. `flush`
+    returns one result per document, either the inserted _id or an
+    exception, and each caller gets its own. While one batch is being
+    written the next one fills up. Callers wait on `submit` once
+    `max_queue` documents are queued (backpressure).
+    """
+
+    def __init__(self, flush, max_docs=WRITE_COALESCE_MAX_DOCS, max_wait_ms=WRITE_COALESCE_MAX_WAIT_MS,
+                 max_queue=WRITE_COALESCE_QUEUE):
+        self.flush = flush
+        self.max_docs = max_docs
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self._loop = None
+        self._queue = None
+        self._full = None
+        self._task = None
+        self.batches = 0
+        self.documents = 0
+        self.failed_batches = 0
+
+    def _start(self):
+        # Queues and tasks belong to one event loop; a new loop (e.g. a
+        # restarted app or a new worker) gets its own
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._full = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    async def submit(self, document):
+        self._start()
+        future = self._loop.create_future()
+        await self._queue.put((document, future))
+        if self._queue.qsize() >= self.max_docs:
+            self._full.set()
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            if self.max_wait > 0 and self._queue.qsize() < self.max_docs - 1:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+            while len(batch) < self.max_docs and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush(self, batch):
+        start = time.perf_counter()
+        try:
+            results = await self.flush([document for document, _ in batch])
+        except Exception as e:
+            self.failed_batches += 1
+            results = [e] * len(batch)
+        flush_latency.observe(time.perf_counter() - start)
+        batch_sizes.observe(len(batch))
+        self.batches += 1
+        self.documents += len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():  # caller went away; the insert still happened
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def drain(self):
+        """Flush everything queued and stop the background task (call on shutdown)."""
+        if self._task is None or self._loop is not asyncio.get_running_loop():
+            return
+        await self._queue.join()
+        self._task.cancel()
+        self._task = None
+        self._loop = None
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "max_docs": self.max_docs,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "documents": self.documents,
+            "failed_batches": self.failed_batches,
+            "avg_batch_size": self.documents / self.batches if self.batches else 0.0,
+        }